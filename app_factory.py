@@ -0,0 +1,16 @@
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from router.compression import CompressionMiddleware
+
+# responses below this many bytes are not worth the compression round trip
+COMPRESSION_MINIMUM_SIZE = 1000
+
+
+def create_app(compress: bool = True, **kwargs) -> FastAPI:
+    # every app serializes with orjson; compression is only needed on the outermost
+    # app since its middleware already wraps whatever is mounted under it
+    app = FastAPI(default_response_class=ORJSONResponse, **kwargs)
+    if compress:
+        app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+    return app
@@ -0,0 +1,95 @@
+"""Compare the two ways of rendering a ward feed page.
+
+legacy: (Complaint, ComplaintType, UserProfile) ORM rows validated through
+        List[ComplaintListResponse] and encoded the way FastAPI does it.
+fast:   get_complaints_json, plain column rows encoded with orjson.
+
+Both include the query; each limit reports the median wall time per page and
+the peak traced allocation of a single render.
+
+    python -m benchmarks.feed_serialization --limits 30 100 500 --repeat 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.seed import configure_environment, seed_database
+
+
+async def render_legacy(limit: int) -> bytes:
+    from typing import List
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from database.db import AsyncSessionLocal
+    from database.models import Complaint, ComplaintType, UserProfile
+    from database.schemas import ComplaintListResponse
+    from router.complaints.complaints_functions import _feed_query
+
+    field = create_response_field(name="feed", type_=List[ComplaintListResponse])
+    async with AsyncSessionLocal() as db:
+        # the feed as it was served before get_complaints_json, on the same query
+        query, _, _ = await _feed_query(db, (Complaint, ComplaintType, UserProfile), 0, limit, "ward-1", False, False, None, None)
+        complaints = (await db.execute(query)).all()
+        content = await serialize_response(field=field, response_content=complaints)
+    return JSONResponse(content).body
+
+
+async def render_fast(limit: int) -> bytes:
+    from database.db import AsyncSessionLocal
+    from router.complaints.complaints_functions import get_complaints_json
+
+    async with AsyncSessionLocal() as db:
+        body, _ = await get_complaints_json(db, limit=limit, ward_slug="ward-1")
+    return body
+
+
+async def measure(render, limit: int, repeat: int):
+    await render(limit)  # warm the statement cache and connection pool
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await render(limit)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    body = await render(limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(body)
+
+
+async def run(limits, repeat: int):
+    print("{:>6} {:>8} {:>10} {:>12} {:>10}".format("limit", "path", "median ms", "peak alloc", "bytes"))
+    for limit in limits:
+        results = {}
+        for name, render in (("legacy", render_legacy), ("fast", render_fast)):
+            results[name] = await measure(render, limit, repeat)
+            median, peak, size = results[name]
+            print("{:>6} {:>8} {:>10.2f} {:>10.0f}kB {:>10}".format(limit, name, median * 1000, peak / 1024, size))
+        print("{:>6} {:>8} {:>9.1f}x {:>11.1f}x".format(
+            limit, "speedup", results["legacy"][0] / results["fast"][0], results["legacy"][1] / results["fast"][1]
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary sqlite file")
+    parser.add_argument("--limits", type=int, nargs="+", default=[30, 100, 500])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    database_url = args.database_url or "sqlite:///{}".format(os.path.join(tempfile.mkdtemp(), "feed_serialization.db"))
+    configure_environment(database_url)
+    seed_database(users=50, complaints=max(args.limits), seed=args.seed)
+    asyncio.run(run(args.limits, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
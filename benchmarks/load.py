@@ -0,0 +1,315 @@
+"""Load benchmark for the citizen app and the mounted authority and zone apps.
+
+Seeds a fresh database, then drives the real ASGI app in-process through
+httpx with a weighted mix of operations from a pool of concurrent clients:
+
+    feed        GET  /complaints/{ward}/ (popular or recent, sometimes page 2)
+    detail      GET  /complaints/{ward}/{id}/
+    comments    GET  /complaints/{id}/comments
+    zone        GET  /zone/... geography lookups
+    nearby      GET  /complaints/nearby (not in the default mix)
+    vote        POST /complaints/{id}/vote
+    comment     POST /complaints/{id}/comments/
+    login       POST /auth/token/ (bcrypt)
+    councillor  POST /authority/auth/token/ (bcrypt + TOTP), then
+                POST /authority/councillor/make_updates
+
+Reports p50/p95/p99 latency, throughput, errors and SQL statements per
+request (read from the Server-Timing header; "-" when the app under test
+does not send it). No external services are needed; pass --database-url to
+run against Postgres instead of a temporary SQLite file.
+
+    python -m benchmarks.load --requests 2000 --concurrency 20
+    python -m benchmarks.load --mix feed=80,vote=20 --json result.json
+    python -m benchmarks.load --compare HEAD~5 HEAD
+
+--compare runs the same benchmark in a throwaway git worktree per revision
+(with this copy of benchmarks/ dropped in) and prints the two side by side.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.seed import (COUNCILLOR_TOTP_SECRET, configure_environment,
+                             seed_database)
+
+DEFAULT_MIX = "feed=45,detail=10,comments=10,zone=5,vote=15,comment=5,login=5,councillor=5"
+PASSWORD = "benchmark-password"
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit("unknown operation {!r}, expected one of {}".format(name, ", ".join(OPERATIONS)))
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.queries = {}
+        self.errors = {}
+
+    def record(self, name: str, response, elapsed: float, expected=(200,)):
+        self.latencies.setdefault(name, []).append(elapsed)
+        if response.status_code not in expected:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries.setdefault(name, []).append(int(match.group(1)))
+
+
+class Scenario:
+    def __init__(self, client, recorder: Recorder, rng: random.Random, args):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.args = args
+
+    async def request(self, name, method, url, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.recorder.record(name, response, time.perf_counter() - started, expected)
+        return response
+
+    def citizen(self):
+        from router.auth.auth_functions import create_access_token
+
+        username = "user{}".format(self.rng.randrange(self.args.users))
+        return {"Authorization": "Bearer " + create_access_token({"sub": username})}
+
+    def ward(self):
+        return "ward-{}".format(self.rng.randint(1, self.args.wards))
+
+    def complaint_id(self):
+        return self.rng.randint(1, self.args.complaints)
+
+    async def feed(self):
+        params = {"limit": 30}
+        if self.rng.random() < 0.3:
+            params["recent"] = "true"
+        url = "/complaints/{}/".format(self.ward())
+        response = await self.request("feed", "GET", url, params=params)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor and self.rng.random() < 0.3:
+            # the next page of the same ward's feed
+            params["cursor"] = cursor
+            await self.request("feed", "GET", url, params=params)
+
+    async def detail(self):
+        complaint_id = self.complaint_id()
+        ward = "ward-{}".format(complaint_id % self.args.wards + 1)
+        await self.request("detail", "GET", "/complaints/{}/{}/".format(ward, complaint_id))
+
+    async def comments(self):
+        await self.request("comments", "GET", "/complaints/{}/comments".format(self.complaint_id()))
+
+    async def zone(self):
+        url = self.rng.choice(("/zone/districts", "/zone/districts_and_complaint_types", "/zone/municipalities/1", "/zone/wards/1"))
+        await self.request("zone", "GET", url)
+
+    async def nearby(self):
+        # seeded complaints are spread over a 0.1 degree (~11km) square from 19N 72E
+        params = {"lat": 19 + self.rng.random() / 10, "lon": 72 + self.rng.random() / 10, "radius": self.rng.choice((250, 1000, 3000))}
+        await self.request("nearby", "GET", "/complaints/nearby", params=params)
+
+    async def vote(self):
+        url = "/complaints/{}/vote".format(self.complaint_id())
+        await self.request("vote", "POST", url, params={"vote": self.rng.choice((1, 0, -1))}, headers=self.citizen())
+
+    async def comment(self):
+        url = "/complaints/{}/comments/".format(self.complaint_id())
+        await self.request("comment", "POST", url, json={"comment_text": "load test comment"}, headers=self.citizen())
+
+    async def login(self):
+        data = {"username": "user{}".format(self.rng.randrange(self.args.users)), "password": PASSWORD}
+        await self.request("login", "POST", "/auth/token/", data=data)
+
+    async def councillor(self):
+        import pyotp
+
+        ward_id = self.rng.randint(1, self.args.wards)
+        data = {"username": "councillor{}".format(ward_id), "password": PASSWORD + pyotp.TOTP(COUNCILLOR_TOTP_SECRET).now()}
+        response = await self.request("councillor_login", "POST", "/authority/auth/token/", data=data)
+        if response.status_code != 200:
+            return
+        headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+        # complaints are assigned to wards round robin, pick one in this councillor's ward
+        complaint_id = self.rng.randrange((ward_id - 1) or self.args.wards, self.args.complaints + 1, self.args.wards)
+        body = {"complaint_id": complaint_id, "update_text": "Work has started"}
+        await self.request("councillor_update", "POST", "/authority/councillor/make_updates", json=body, headers=headers)
+
+
+OPERATIONS = ("feed", "detail", "comments", "zone", "nearby", "vote", "comment", "login", "councillor")
+
+
+async def drive(args) -> dict:
+    import httpx
+
+    import main
+
+    weights = parse_mix(args.mix)
+    names, odds = list(weights), list(weights.values())
+    # app errors come back as 500s and are counted, like they would be behind a real server
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    recorder = Recorder()
+    remaining = args.requests
+
+    async def worker(worker_id: int):
+        nonlocal remaining
+        rng = random.Random(args.seed * 1000 + worker_id)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            scenario = Scenario(client, recorder, rng, args)
+            while remaining > 0:
+                remaining -= 1
+                await getattr(scenario, rng.choices(names, odds)[0])()
+
+    # warm up imports, statement caches and the zone cache outside the measured window
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        warmup = Scenario(client, Recorder(), random.Random(args.seed), args)
+        for name in names:
+            await getattr(warmup, name)()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(recorder, elapsed)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    operations = {}
+    for name, latencies in sorted(recorder.latencies.items()):
+        queries = recorder.queries.get(name)
+        operations[name] = {
+            "count": len(latencies),
+            "errors": recorder.errors.get(name, 0),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "queries": statistics.mean(queries) if queries else None,
+        }
+    total = sum(op["count"] for op in operations.values())
+    return {"elapsed_s": elapsed, "requests": total, "throughput_rps": total / elapsed, "operations": operations}
+
+
+def _queries(value) -> str:
+    return "-" if value is None else "{:.1f}".format(value)
+
+
+def print_report(result: dict):
+    print("{:<20} {:>7} {:>7} {:>9} {:>9} {:>9} {:>8}".format("operation", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "queries"))
+    for name, op in result["operations"].items():
+        print("{:<20} {:>7} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>8}".format(
+            name, op["count"], op["errors"], op["p50_ms"], op["p95_ms"], op["p99_ms"], _queries(op["queries"])
+        ))
+    print("{} requests in {:.2f}s, {:.1f} req/s".format(result["requests"], result["elapsed_s"], result["throughput_rps"]))
+
+
+def print_comparison(base_name: str, base: dict, head_name: str, head: dict):
+    print("{:<20} {:>21} {:>21} {:>15}".format("", "p50 ms", "p95 ms", "queries"))
+    print("{:<20} {:>10} {:>10} {:>10} {:>10} {:>7} {:>7}".format("operation", base_name[:10], head_name[:10], base_name[:10], head_name[:10], "base", "head"))
+    for name in sorted(set(base["operations"]) | set(head["operations"])):
+        a, b = base["operations"].get(name), head["operations"].get(name)
+        if not a or not b:
+            continue
+        print("{:<20} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>7} {:>7}".format(
+            name, a["p50_ms"], b["p50_ms"], a["p95_ms"], b["p95_ms"], _queries(a["queries"]), _queries(b["queries"])
+        ))
+    print("throughput: {} {:.1f} req/s, {} {:.1f} req/s ({:+.0f}%)".format(
+        base_name, base["throughput_rps"], head_name, head["throughput_rps"],
+        (head["throughput_rps"] / base["throughput_rps"] - 1) * 100,
+    ))
+
+
+def run_revision(revision: str, passthrough: list) -> dict:
+    repo = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], text=True).strip()
+    workdir = tempfile.mkdtemp(prefix="load-")
+    tree = os.path.join(workdir, "tree")
+    output = os.path.join(workdir, "result.json")
+    subprocess.check_call(["git", "-C", repo, "worktree", "add", "--detach", "--quiet", tree, revision])
+    try:
+        # older revisions may predate the harness, always run this copy of it
+        shutil.rmtree(os.path.join(tree, "benchmarks"), ignore_errors=True)
+        shutil.copytree(os.path.dirname(os.path.abspath(__file__)), os.path.join(tree, "benchmarks"),
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        print("running {} ...".format(revision), file=sys.stderr)
+        subprocess.check_call([sys.executable, "-m", "benchmarks.load", "--json", output, *passthrough], cwd=tree)
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        subprocess.call(["git", "-C", repo, "worktree", "remove", "--force", tree])
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary sqlite file")
+    parser.add_argument("--wards", type=int, default=5)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--complaints", type=int, default=2000)
+    parser.add_argument("--votes", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000, help="operations to run across all clients")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma separated operation=weight pairs")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="cost factor of the seeded password hashes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--compare", nargs="+", metavar="REV", help="benchmark one or two git revisions (the second defaults to the checkout)")
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.compare:
+        if len(args.compare) > 2:
+            parser.error("--compare takes one or two revisions")
+        position = sys.argv.index("--compare")
+        passthrough = sys.argv[1:position] + sys.argv[position + 1 + len(args.compare):]
+        base = run_revision(args.compare[0], passthrough)
+        if len(args.compare) == 2:
+            head_name, head = args.compare[1], run_revision(args.compare[1], passthrough)
+        else:
+            head_name = "checkout"
+            workdir = tempfile.mkdtemp(prefix="load-")
+            output = os.path.join(workdir, "result.json")
+            subprocess.check_call([sys.executable, "-m", "benchmarks.load", "--json", output, *passthrough])
+            with open(output) as f:
+                head = json.load(f)
+            shutil.rmtree(workdir, ignore_errors=True)
+        print_comparison(args.compare[0], base, head_name, head)
+        return
+
+    database_url = args.database_url or "sqlite:///{}".format(os.path.join(tempfile.mkdtemp(), "load.db"))
+    configure_environment(database_url)
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    seed_database(wards=args.wards, users=args.users, complaints=args.complaints, seed=args.seed,
+                  votes=args.votes, comments=args.comments, password=PASSWORD)
+    result = asyncio.run(drive(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Response sizes per endpoint, uncompressed and as sent with gzip and brotli.
+
+Runs the app in-process against a seeded sqlite database and reports the
+bytes on the wire for each Accept-Encoding. Brotli is only reported when
+the optional brotli module is installed.
+
+    python -m benchmarks.payload_sizes --complaints 500
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.seed import configure_environment, seed_database
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def endpoints(limit: int):
+    return [
+        ("feed popular", "/complaints/ward-1/?limit={}".format(limit)),
+        ("feed recent", "/complaints/ward-1/?recent=true&limit={}".format(limit)),
+        ("complaint detail", "/complaints/ward-1/1/"),
+        ("comments", "/complaints/1/comments"),
+        ("profile", "/user/profile/"),
+        ("user complaints", "/user/complaints/"),
+        ("zone districts + types", "/zone/districts_and_complaint_types"),
+        ("zone municipalities", "/zone/municipalities/1"),
+        ("zone wards", "/zone/wards/1"),
+    ]
+
+
+def measure(limit: int):
+    from fastapi.testclient import TestClient
+
+    import main
+    from router.auth.auth_functions import create_access_token
+    from router.compression import brotli
+
+    client = TestClient(main.app)
+    token = create_access_token({"sub": "user0"})
+    encodings = [encoding for encoding in ENCODINGS if encoding != "br" or brotli is not None]
+    print("{:<24} {:>7} ".format("endpoint", "status") + " ".join("{:>10}".format(e) for e in encodings) + " {:>8}".format("ratio"))
+    for name, path in endpoints(limit):
+        sizes = {}
+        status = None
+        for encoding in encodings:
+            with client.stream("GET", path, headers={"Authorization": "Bearer " + token, "Accept-Encoding": encoding}) as response:
+                status = response.status_code
+                sizes[encoding] = sum(len(chunk) for chunk in response.iter_raw())
+        best = min(sizes.values())
+        print("{:<24} {:>7} ".format(name, status) + " ".join("{:>10}".format(sizes[e]) for e in encodings)
+              + " {:>7.1f}x".format(sizes["identity"] / best if best else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary sqlite file")
+    parser.add_argument("--complaints", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=30, help="feed page size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    database_url = args.database_url or "sqlite:///{}".format(os.path.join(tempfile.mkdtemp(), "payload_sizes.db"))
+    configure_environment(database_url)
+    seed_database(users=50, complaints=args.complaints, seed=args.seed)
+    measure(args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import datetime
+import importlib.util
+import os
+import random
+
+# settings the app refuses to start without; real values are irrelevant for local benchmarks
+BENCHMARK_ENVIRONMENT = {
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "MAIL_USERNAME": "benchmark@example.com",
+    "MAIL_PASSWORD": "benchmark",
+    "RAPIDAPI_HOST": "localhost",
+    "RAPIDAPI_KEY": "benchmark",
+    "FRONT_END_URL": "http://localhost:3000",
+    "MAIL_QUEUE_IN_PROCESS": "false",
+    # the load benchmark logs in far faster than any real client
+    "LOGIN_RATE_LIMIT_ENABLED": "false",
+}
+
+COUNCILLOR_TOTP_SECRET = "JBSWY3DPEHPK3PXP"
+
+
+# must run before anything under database/ or router/ is imported
+def configure_environment(database_url: str):
+    os.environ["SQLALCHEMY_DATABASE_URL"] = database_url
+    for key, value in BENCHMARK_ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+
+
+def hash_password(password: str) -> str:
+    # one bcrypt hash shared by every seeded account, at the cost factor the app verifies with
+    from passlib.context import CryptContext
+
+    rounds = int(os.environ.get("BCRYPT_ROUNDS", 12))
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(password)
+
+
+def seed_database(wards: int = 1, users: int = 10, complaints: int = 100, seed: int = 0,
+                  votes: int = 0, comments: int = 0, password: str = None):
+    from database import models
+    from database.db import SessionLocal, engine
+    from database.models import (Base, Comment, Complaint, ComplaintStatus,
+                                 ComplaintSubType, ComplaintType, District,
+                                 Municipality, User, UserProfile, Votes, Ward,
+                                 WardServant, WardServantProfile)
+
+    rng = random.Random(seed)
+    hashed_password = hash_password(password) if password else ""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(District(district_id=1, district_name="Benchmark District"))
+    db.add(Municipality(municipality_id=1, municipality_name="Benchmark Municipality", district_id=1))
+    db.add(ComplaintType(id=1, type_name="Roads"))
+    db.add(ComplaintSubType(id=1, sub_type_name="Potholes", parent_type=1))
+    for ward_id in range(1, wards + 1):
+        db.add(Ward(ward_id=ward_id, ward_slug="ward-{}".format(ward_id), ward_name="Ward {}".format(ward_id), municipality_id=1))
+        servant = "councillor{}".format(ward_id)
+        db.add(WardServant(id=ward_id, username=servant, email="{}@example.com".format(servant), hashed_password=hashed_password, secret_key=COUNCILLOR_TOTP_SECRET))
+        db.add(WardServantProfile(username=servant, first_name="Ward", last_name=str(ward_id), ward_id=ward_id, position="NAGARSEVAK"))
+    for user_id in range(users):
+        username = "user{}".format(user_id)
+        db.add(User(username=username, email="{}@example.com".format(username), hashed_password=hashed_password))
+        db.add(UserProfile(username=username, district=1, municipality=1, ward=user_id % wards + 1))
+    db.flush()
+    started = datetime.datetime(2022, 1, 1)
+    complaint_rows = [
+        {
+            "id": complaint_id,
+            "complaint_title": "Complaint {}".format(complaint_id),
+            "complaint_desc": "Benchmark complaint description {}".format(complaint_id),
+            "photo_url": "https://example.com/{}.png".format(complaint_id),
+            "latitude": 19 + rng.randrange(100000) / 1e6,
+            "longitude": 72 + rng.randrange(100000) / 1e6,
+            "username": "user{}".format(rng.randrange(users)),
+            "complaint_type": 1,
+            "complaint_sub_type": 1,
+            "ward_id": complaint_id % wards + 1,
+            "completed_status": "PENDING",
+            "like_count": 0,
+            "dislike_count": 0,
+            "no_of_comments": 0,
+            "created_at": started + datetime.timedelta(minutes=complaint_id),
+        }
+        for complaint_id in range(1, complaints + 1)
+    ]
+    # distinct (user, complaint) pairs, with like_count kept equal to SUM(votes.vote)
+    vote_rows = {}
+    for _ in range(min(votes, users * complaints)):
+        while True:
+            key = ("user{}".format(rng.randrange(users)), rng.randint(1, complaints))
+            if key not in vote_rows:
+                break
+        vote_rows[key] = rng.choice((1, 1, 1, -1))
+    for (_, complaint_id), vote in vote_rows.items():
+        complaint_rows[complaint_id - 1]["like_count"] += vote
+    comment_rows = []
+    for comment_id in range(1, comments + 1):
+        complaint_id = rng.randint(1, complaints)
+        parent = rng.choice(comment_rows) if comment_rows and rng.random() < 0.3 else None
+        if parent:
+            complaint_id = parent["complaint_id"]
+        comment_rows.append({
+            "id": comment_id,
+            "comment_text": "Benchmark comment {}".format(comment_id),
+            "complaint_id": complaint_id,
+            "username": "user{}".format(rng.randrange(users)),
+            "created_at": started + datetime.timedelta(minutes=complaints + comment_id),
+            "parent_comment_id": parent["id"] if parent else None,
+        })
+        complaint_rows[complaint_id - 1]["no_of_comments"] += 1
+    if hasattr(Complaint, "geohash"):
+        from router.geohash import encode as encode_geohash
+
+        for row in complaint_rows:
+            row["geohash"] = encode_geohash(row["latitude"], row["longitude"])
+    db.bulk_insert_mappings(Complaint, complaint_rows)
+    db.bulk_insert_mappings(ComplaintStatus, [
+        {"complaint_id": complaint_id, "ward_servant_username": "councillor{}".format(complaint_id % wards + 1), "completed_status": "PENDING"}
+        for complaint_id in range(1, complaints + 1)
+    ])
+    db.bulk_insert_mappings(Votes, [
+        {"username": username, "complaint_id": complaint_id, "vote": vote}
+        for (username, complaint_id), vote in vote_rows.items()
+    ])
+    db.bulk_insert_mappings(Comment, comment_rows)
+    if hasattr(UserProfile, "pending_complaints_count"):
+        pending = {}
+        for row in complaint_rows:
+            pending[row["username"]] = pending.get(row["username"], 0) + 1
+        db.bulk_update_mappings(UserProfile, [
+            {"username": username, "pending_complaints_count": count} for username, count in pending.items()
+        ])
+    db.commit()
+    if hasattr(models, "WardDailyStats"):
+        from router.ward.ward_rollups import rebuild_ward_rollups
+
+        rebuild_ward_rollups(db)
+    if importlib.util.find_spec("router.complaints.complaint_search"):
+        # bulk inserts skip the per-complaint indexing, so fill the full-text index in one pass
+        from router.complaints.complaint_search import rebuild_search_index
+
+        rebuild_search_index(db)
+    db.close()
@@ -0,0 +1,108 @@
+"""Concurrency stress test for the vote path.
+
+Fires many concurrent votes (including repeated double-taps by the same user)
+at a handful of complaints and checks that like_count == SUM(votes.vote)
+for every complaint afterwards.
+
+    python -m benchmarks.vote_stress --users 200 --votes 5000
+    python -m benchmarks.vote_stress --buffered   # write-behind like_count buffer
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.seed import configure_environment, seed_database
+
+
+async def run(users: int, complaints: int, votes: int, concurrency: int, seed: int):
+    from fastapi import HTTPException
+
+    from database.db import AsyncSessionLocal
+    from database.schemas import UserBase
+    from router.complaints.complaints_functions import create_post_vote
+    from router.complaints.vote_buffer import vote_buffer
+
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    principals = [UserBase(username="user{}".format(i), email="user{}@example.com".format(i)) for i in range(users)]
+
+    busy = 0
+
+    async def cast(user, complaint_id, vote):
+        nonlocal busy
+        async with semaphore:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await create_post_vote(db, complaint_id, vote, user)
+            except HTTPException as error:
+                # lock races that outlasted every retry; each one is a vote the user lost
+                if error.status_code != 503:
+                    raise
+                busy += 1
+
+    tasks = []
+    for _ in range(votes):
+        user = rng.choice(principals)
+        complaint_id = rng.randint(1, complaints)
+        vote = rng.choice((-1, 0, 1))
+        tasks.append(cast(user, complaint_id, vote))
+        if rng.random() < 0.2:
+            # double-tap: the same vote sent twice at once
+            tasks.append(cast(user, complaint_id, vote))
+    started = time.perf_counter()
+    if vote_buffer.enabled:
+        flusher = asyncio.create_task(vote_buffer.run())
+    await asyncio.gather(*tasks)
+    if vote_buffer.enabled:
+        vote_buffer.stop()
+        await flusher
+    elapsed = time.perf_counter() - started
+    print("{} votes in {:.2f}s ({:.0f} votes/s), {} rejected as busy".format(len(tasks), elapsed, len(tasks) / elapsed, busy))
+    return busy
+
+
+def check_invariant() -> int:
+    from sqlalchemy import text
+
+    from database.db import engine
+
+    with engine.connect() as connection:
+        drifted = connection.execute(text(
+            "SELECT c.id, c.like_count, COALESCE(SUM(v.vote), 0) AS total FROM complaints c "
+            "LEFT JOIN votes v ON v.complaint_id = c.id GROUP BY c.id, c.like_count "
+            "HAVING c.like_count != COALESCE(SUM(v.vote), 0)"
+        )).all()
+    for complaint_id, like_count, total in drifted:
+        print("complaint {}: like_count={} but SUM(votes.vote)={}".format(complaint_id, like_count, total))
+    return len(drifted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary sqlite file")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--complaints", type=int, default=5)
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--buffered", action="store_true", help="enable the write-behind vote counter buffer")
+    args = parser.parse_args()
+
+    database_url = args.database_url or "sqlite:///{}".format(os.path.join(tempfile.mkdtemp(), "vote_stress.db"))
+    configure_environment(database_url)
+    os.environ["VOTE_BUFFER_ENABLED"] = "true" if args.buffered else "false"
+    seed_database(users=args.users, complaints=args.complaints, seed=args.seed)
+    busy = asyncio.run(run(args.users, args.complaints, args.votes, args.concurrency, args.seed))
+    drifted = check_invariant()
+    if drifted:
+        raise SystemExit("FAILED: {} complaint(s) drifted".format(drifted))
+    if busy:
+        raise SystemExit("FAILED: {} vote(s) rejected as busy".format(busy))
+    print("OK: like_count == SUM(votes.vote) for all complaints")
+
+
+if __name__ == "__main__":
+    main()
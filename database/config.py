@@ -2,7 +2,39 @@ from pydantic import BaseSettings
 
 
 class Database_settings(BaseSettings):
-    SQLALCHEMY_DATABASE_URL:str
+    SQLALCHEMY_DATABASE_URL:str = "sqlite:///./test.db"
+    # connection pool (ignored by sqlite)
+    DB_POOL_SIZE:int = 5
+    DB_MAX_OVERFLOW:int = 10
+    DB_POOL_PRE_PING:bool = True
+    DB_POOL_RECYCLE_SECONDS:int = 1800
+    DB_STATEMENT_TIMEOUT_MS:int = 0
+    # sqlite connect-time pragmas
+    SQLITE_JOURNAL_MODE:str = "WAL"
+    SQLITE_SYNCHRONOUS:str = "NORMAL"
+    SQLITE_MMAP_SIZE:int = 268435456
+    SQLITE_BUSY_TIMEOUT_MS:int = 5000
+    # write-behind like_count buffer for hot complaints (per process)
+    VOTE_BUFFER_ENABLED:bool = False
+    VOTE_BUFFER_FLUSH_MS:int = 250
+    # rebuilds every like_count from votes at startup; only safe when this process is the only api worker
+    VOTE_BUFFER_REPLAY_ON_STARTUP:bool = False
+    # attempts at a vote transaction that lost a lock race before answering 503
+    VOTE_MAX_ATTEMPTS:int = 5
+    VOTE_RETRY_BASE_MS:int = 20
+    # statements at or above this duration are logged and counted; 0 disables the slow-query log
+    SLOW_QUERY_THRESHOLD_MS:int = 0
+    # duplicate check on complaint submission: pending complaints of the same ward and type,
+    # this close and this recent, whose estimated text similarity reaches the threshold
+    DUPLICATE_CHECK_ENABLED:bool = True
+    DUPLICATE_RADIUS_M:int = 150
+    DUPLICATE_WINDOW_DAYS:int = 30
+    DUPLICATE_MIN_SIMILARITY:float = 0.3
+    DUPLICATE_MAX_RESULTS:int = 5
+    # zone_cache reloads after this long even if nothing announced a change, which covers
+    # raw sql and csv edits; announced changes reach every worker within the check interval
+    ZONE_CACHE_TTL_SECONDS:int = 300
+    ZONE_CACHE_CHECK_SECONDS:int = 5
     
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
 from fastapi import Depends
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from database.models import (District, Municipality, TemporaryUser,
@@ -47,3 +48,9 @@ def get_first_values(db:Session):
     ward_id= db.query(Ward).filter(Ward.municipality_id==municipality_id).first().ward_id
     return {"district_id":district_id, "municipality_id": municipality_id, "ward_id": ward_id}
 
+
+# INSERT supporting ON CONFLICT for the session's backend (sqlite or postgresql)
+def upsert_insert(db, model):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
@@ -1,4 +1,4 @@
-from database.db import SessionLocal
+from database.db import AsyncSessionLocal, SessionLocal
 
 
 # Dependency
@@ -8,3 +8,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
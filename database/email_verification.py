@@ -1,30 +1,16 @@
 from typing import List
 
-from fastapi import BackgroundTasks
 from fastapi.responses import JSONResponse
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema
 from pydantic import BaseModel, EmailStr
-from router.auth.config import Settings, get_settings
+from sqlalchemy.orm import Session
+
+from database.models import OutboundEmail
 
-auth_config_settings:Settings = get_settings()
 
 class EmailSchema(BaseModel):
     email: List[EmailStr]
 
 
-conf = ConnectionConfig(
-    MAIL_USERNAME = auth_config_settings.MAIL_USERNAME,
-    MAIL_PASSWORD = auth_config_settings.MAIL_PASSWORD,
-    MAIL_FROM = auth_config_settings.MAIL_USERNAME,
-    MAIL_PORT = 587,
-    MAIL_SERVER = "smtp.gmail.com",
-    MAIL_FROM_NAME="Citizen",
-    MAIL_TLS = True,
-    MAIL_SSL = False,
-    USE_CREDENTIALS = True,
-    VALIDATE_CERTS = True
-)
-
 html = """
         <html>
             <body>
@@ -37,18 +23,17 @@ html = """
         </html>
         """
 
+# queue a message; it is stored with the caller's transaction and sent by database.mail_queue
+def enqueue_email(db: Session, recipient: str, subject: str, body_html: str) -> OutboundEmail:
+    outbound_email = OutboundEmail(recipient=recipient, subject=subject, body_html=body_html)
+    db.add(outbound_email)
+    return outbound_email
+
 async def send_verification_email(
+    db: Session,
     email: EmailStr,
     token: str,
-    background_tasks: BackgroundTasks,
     ) :
-    message = MessageSchema(
-        subject="Verify your email",
-        recipients=[email],  # List of recipients, as many as you can pass 
-        subtype="html",
-        html=html.format(token),
-        )
-
-    fm = FastMail(conf)
-    background_tasks.add_task(fm.send_message,message)
+    enqueue_email(db, email, "Verify your email", html.format(token))
+    db.commit()
     return JSONResponse(status_code=200, content={"detail": "email has been sent"})
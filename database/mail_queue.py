@@ -0,0 +1,169 @@
+import asyncio
+import datetime
+import logging
+import uuid
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Union
+
+import aiosmtplib
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.db import AsyncSessionLocal
+from database.models import OutboundEmail
+from router.auth.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# how long a claimed batch is leased before another worker may pick it up again
+CLAIM_LEASE = datetime.timedelta(minutes=5)
+MAX_RETRY_DELAY_SECONDS = 3600
+UNSENT_STATUSES = ("PENDING", "SENDING", "FAILED")
+
+
+async def queue_depth(db: AsyncSession) -> dict:
+    # messages not yet delivered; sent rows only grow, so they stay out of the status index scan
+    rows = (await db.execute(
+        select(OutboundEmail.status, func.count()).where(OutboundEmail.status.in_(UNSENT_STATUSES)).group_by(OutboundEmail.status)
+    )).all()
+    depth = dict.fromkeys(UNSENT_STATUSES, 0)
+    depth.update({status: count for status, count in rows})
+    return depth
+
+
+class MailQueueWorker:
+    # drains outbound_emails in batches over one reused, authenticated smtp connection
+    def __init__(self, settings: Settings = None, session_factory=AsyncSessionLocal):
+        self.settings = settings or get_settings()
+        self.session_factory = session_factory
+        self.worker_id = uuid.uuid4().hex
+        self._smtp: Union[aiosmtplib.SMTP, None] = None
+        self._last_used = 0.0
+        self._stopped = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(
+            hostname=self.settings.MAIL_SERVER,
+            port=self.settings.MAIL_PORT,
+            use_tls=self.settings.MAIL_SSL,
+            start_tls=self.settings.MAIL_STARTTLS,
+            timeout=self.settings.MAIL_TIMEOUT_SECONDS,
+        )
+        await smtp.connect()
+        if self.settings.MAIL_USE_CREDENTIALS:
+            try:
+                await smtp.login(self.settings.MAIL_USERNAME, self.settings.MAIL_PASSWORD)
+            except aiosmtplib.SMTPException:
+                smtp.close()
+                raise
+        self._smtp = smtp
+        return smtp
+
+    async def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    def _build_message(self, outbound_email: OutboundEmail) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = formataddr((self.settings.MAIL_FROM_NAME, self.settings.MAIL_USERNAME))
+        message["To"] = outbound_email.recipient
+        message["Subject"] = outbound_email.subject
+        message.set_content(outbound_email.body_html, subtype="html")
+        return message
+
+    async def _claim_batch(self, db: AsyncSession):
+        now = datetime.datetime.now()
+        # SENDING rows whose lease ran out belong to a worker that died mid-batch
+        due = and_(OutboundEmail.status.in_(("PENDING", "SENDING")), OutboundEmail.next_attempt_at <= now)
+        ids = (await db.execute(
+            select(OutboundEmail.id).where(due).order_by(OutboundEmail.next_attempt_at).limit(self.settings.MAIL_BATCH_SIZE)
+        )).scalars().all()
+        if not ids:
+            return []
+        await db.execute(
+            update(OutboundEmail)
+            .where(OutboundEmail.id.in_(ids), due)
+            .values(status="SENDING", claimed_by=self.worker_id, next_attempt_at=now + CLAIM_LEASE)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return (await db.execute(
+            select(OutboundEmail).where(OutboundEmail.id.in_(ids), OutboundEmail.claimed_by == self.worker_id, OutboundEmail.status == "SENDING")
+        )).scalars().all()
+
+    def _reschedule(self, outbound_email: OutboundEmail, error: Exception):
+        outbound_email.attempts += 1
+        outbound_email.last_error = repr(error)[:500]
+        outbound_email.claimed_by = None
+        if outbound_email.attempts >= self.settings.MAIL_MAX_ATTEMPTS:
+            outbound_email.status = "FAILED"
+            self.failed += 1
+            logger.error("giving up on email %s to %s: %r", outbound_email.id, outbound_email.recipient, error)
+            return
+        delay = min(self.settings.MAIL_RETRY_BASE_SECONDS * 2 ** (outbound_email.attempts - 1), MAX_RETRY_DELAY_SECONDS)
+        outbound_email.status = "PENDING"
+        outbound_email.next_attempt_at = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+
+    async def process_batch(self) -> int:
+        async with self.session_factory() as db:
+            batch = await self._claim_batch(db)
+            if not batch:
+                return 0
+            for index, outbound_email in enumerate(batch):
+                try:
+                    smtp = await self._connection()
+                    await smtp.send_message(self._build_message(outbound_email))
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPAuthenticationError, aiosmtplib.SMTPTimeoutError, OSError) as exc:
+                    # the connection is gone: back off the rest of the batch and reconnect next round
+                    await self._disconnect()
+                    for remaining in batch[index:]:
+                        self._reschedule(remaining, exc)
+                    break
+                except aiosmtplib.SMTPException as exc:
+                    self._reschedule(outbound_email, exc)
+                else:
+                    outbound_email.status = "SENT"
+                    outbound_email.sent_at = datetime.datetime.now()
+                    outbound_email.attempts += 1
+                    outbound_email.claimed_by = None
+                    self.sent += 1
+            await db.commit()
+            self._last_used = asyncio.get_running_loop().time()
+            return len(batch)
+
+    async def run(self):
+        logger.info("mail queue worker %s started", self.worker_id)
+        loop = asyncio.get_running_loop()
+        while not self._stopped.is_set():
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("mail queue batch failed")
+                processed = 0
+            if processed:
+                continue
+            if self._smtp is not None and loop.time() - self._last_used > self.settings.MAIL_IDLE_DISCONNECT_SECONDS:
+                await self._disconnect()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.settings.MAIL_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        await self._disconnect()
+
+    def stop(self):
+        self._stopped.set()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(MailQueueWorker().run())
@@ -2,8 +2,9 @@ import datetime
 import random
 
 import pyotp
-from sqlalchemy import (Boolean, CheckConstraint, Column, DateTime, Enum,
-                        ForeignKey, Integer, String)
+from sqlalchemy import (DDL, BigInteger, Boolean, CheckConstraint, Column, Date,
+                        DateTime, Enum, Float, ForeignKey, Index, Integer,
+                        LargeBinary, String, Text, event)
 from sqlalchemy.orm import relationship
 
 from database.db import Base, SessionLocal
@@ -137,6 +138,9 @@ class UserProfile(Base):
     district = Column(Integer, ForeignKey("districts.district_id"), index=True,default=0)
     municipality = Column(Integer, ForeignKey("municipalities.municipality_id"), index=True, default=0)
     ward = Column(Integer, ForeignKey("wards.ward_id"), index=True, default=0)
+    # maintained by create_complaint / reform_complaint_status, rebuilt by `manage.py reconcile-user-stats`
+    completed_complaints_count = Column(Integer, nullable=False, default=0, server_default="0")
+    pending_complaints_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     user_name = relationship("User", back_populates="user_profile")
     user_district = relationship("District", back_populates="district_user")
@@ -171,8 +175,9 @@ class Complaint(Base):
     complaint_title = Column(String, index=True, nullable=False)
     complaint_desc = Column(String, index=True, nullable=False)
     photo_url = Column(String, index=True,nullable=False)
-    latitude = Column(String(20), index=True)
-    longitude = Column(String(20), index=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12))
     username = Column(String(128), ForeignKey("user_profiles.username"), index=True)
     complaint_type = Column(Integer, ForeignKey("complaint_types.id"), index=True)
     complaint_sub_type = Column(Integer, ForeignKey("complaint_sub_types.id"), index=True)
@@ -182,6 +187,7 @@ class Complaint(Base):
     dislike_count = Column(Integer, default=0)
     no_of_comments = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.datetime.now)
+    completed_at = Column(DateTime)
 
     ward = relationship("Ward", back_populates="complaints")
     owner_username = relationship("UserProfile", back_populates="complaints")
@@ -192,9 +198,74 @@ class Complaint(Base):
     votes = relationship("Votes", back_populates="complaint")
     complaint_updates = relationship("ComplaintUpdate", back_populates="complaint")
 
+    # keyset pagination indexes for the ward feeds
+    __table_args__ = (
+        Index("ix_complaints_ward_status_likes", "ward_id", "completed_status", "like_count", "id"),
+        Index("ix_complaints_ward_status_created", "ward_id", "completed_status", "created_at", "id"),
+        # nearby search: geohash prefix ranges, with the coordinates in the index for the box check
+        Index("ix_complaints_geohash_location", "geohash", "latitude", "longitude"),
+    )
+
     def __repr__(self):
         return "<Complaint(complaint_title='%s')>" % self.complaint_title
 
+# full-text search over title and description: an external-content fts5 table on sqlite,
+# a generated tsvector column with a gin index on postgres
+COMPLAINT_SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5("
+        "complaint_title, complaint_desc, content='complaints', content_rowid='id', tokenize='porter unicode61')",
+    ],
+    "postgresql": [
+        "ALTER TABLE complaints ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(complaint_title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(complaint_desc, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_complaints_search_vector ON complaints USING gin (search_vector)",
+    ],
+}
+for dialect, statements in COMPLAINT_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Complaint.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
+# minhash of the title and description, written with the complaint and read by the duplicate check
+class ComplaintSignature(Base):
+    __tablename__ = "complaint_signatures"
+
+    complaint_id = Column(Integer, ForeignKey("complaints.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return "<ComplaintSignature(complaint_id='%s')>" % self.complaint_id
+
+# ward dashboard rollups, kept current by router.ward.ward_rollups. every figure belongs to the
+# day the complaint was filed, so the rows can always be rebuilt from the complaints table
+class WardDailyStats(Base):
+    __tablename__ = "ward_daily_stats"
+
+    ward_id = Column(Integer, ForeignKey("wards.ward_id"), primary_key=True)
+    complaint_type = Column(Integer, ForeignKey("complaint_types.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    vote_total = Column(Integer, nullable=False, default=0)
+    resolution_seconds = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return "<WardDailyStats(ward_id='%s', complaint_type='%s', day='%s')>" % (self.ward_id, self.complaint_type, self.day)
+
+# resolution time histogram of the same complaints, for medians without reading every complaint
+class WardResolutionBucket(Base):
+    __tablename__ = "ward_resolution_buckets"
+
+    ward_id = Column(Integer, ForeignKey("wards.ward_id"), primary_key=True)
+    complaint_type = Column(Integer, ForeignKey("complaint_types.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    complaint_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return "<WardResolutionBucket(ward_id='%s', day='%s', bucket='%s')>" % (self.ward_id, self.day, self.bucket)
+
 class ComplaintType(Base):
     __tablename__ = "complaint_types"
 
@@ -245,10 +316,17 @@ class ComplaintStatus(Base):
     complaint_id = Column(Integer, ForeignKey("complaints.id"), primary_key=True, index=True)
     ward_servant_username = Column(String(128), ForeignKey("ward_servant_profiles.username"), index=True)
     completed_status = Column(String, CheckConstraint("completed_status in ('COMPLETED','PENDING')"), index=True, default="PENDING")
+    # time of the ward servant's latest update, maintained by give_complaint_updates
+    last_update_at = Column(DateTime)
 
     complaint = relationship("Complaint", back_populates="complaint_status")
     ward_servant = relationship("WardServantProfile", back_populates="complaint_status")
 
+    # councillor work queue
+    __table_args__ = (
+        Index("ix_complaint_statuses_servant_status", "ward_servant_username", "completed_status"),
+    )
+
 
     def __repr__(self):
         return "<ComplaintStatus(status_name='%s')>" % self.status_name
@@ -279,3 +357,53 @@ class Votes(Base):
 
     def __repr__(self):
         return "<Votes(username='%s', complaint_id ='%s')>" %(self.username, self.complaint_id)
+
+
+# outbound mail queue, drained by database.mail_queue
+class OutboundEmail(Base):
+    __tablename__ = "outbound_emails"
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String(200), nullable=False)
+    body_html = Column(Text, nullable=False)
+    status = Column(String(10), CheckConstraint("status in ('PENDING','SENDING','SENT','FAILED')"), default="PENDING")
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.now)
+    claimed_by = Column(String(32))
+    last_error = Column(String, default="")
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_outbound_emails_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return "<OutboundEmail(recipient='%s', status='%s')>" % (self.recipient, self.status)
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # one family per login; every rotation stays in it and it is the sid claim of the access tokens
+    family_id = Column(String(32), index=True, nullable=False)
+    subject = Column(String(128), index=True, nullable=False)
+    audience = Column(String(10), CheckConstraint("audience in ('citizen','authority')"), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime)
+    revoked_at = Column(DateTime)
+
+    def __repr__(self):
+        return "<RefreshToken(subject='%s', family_id='%s')>" % (self.subject, self.family_id)
+
+
+# bumped on changes to cached tables so every worker process drops its copy, see router.zone.zone_cache
+class CacheGeneration(Base):
+    __tablename__ = "cache_generations"
+    name = Column(String(32), primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return "<CacheGeneration(name='%s', generation=%s)>" % (self.name, self.generation)
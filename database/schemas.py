@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Union
+from datetime import date, datetime
+from typing import List, Union
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -39,6 +39,12 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+class Principal(UserBase):
+    is_active: bool
+
+    class Config:
+        orm_mode = True
+
 class UserProfileBaseSchema(BaseModel):
     first_name: str
     last_name: str
@@ -74,6 +80,10 @@ class MessageWithStatus(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Union[str, None] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class UserLogin(BaseModel):
     username: str
@@ -107,21 +117,24 @@ class ComplaintSchema(ComplaintBase):
     completed_status: str
     created_at: datetime
 
-class ComplaintResponseBase(ComplaintSchema):
-    latitude: str
-    longitude: str
+class ComplaintLocationSchema(ComplaintSchema):
+    # null for legacy complaints whose stored coordinates were not numbers
+    latitude: Union[float, None] = None
+    longitude: Union[float, None] = None
+
+class ComplaintResponseBase(ComplaintLocationSchema):
     ward_slug: str
 
 class ComplaintCreate(ComplaintBase):
-    latitude: str = Field(..., regex=r'^-?([1-8]?[1-9]|[1-9]0)\.{1}\d{1,6}')
-    longitude: str = Field(..., regex=r'^-?([1-8]?[1-9]|[1-9]0)\.{1}\d{1,6}')
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
 
 class UpdatedComplaint(BaseModel):
     complaint_type: int
     complaint_sub_type: int
     ward_id: int
-    latitude: str = Field(..., regex=r'^-?([1-8]?[1-9]|[1-9]0)\.{1}\d{1,6}')
-    longitude: str = Field(..., regex=r'^-?([1-8]?[1-9]|[1-9]0)\.{1}\d{1,6}')
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
 
     class Config:
         orm_mode = True
@@ -141,6 +154,12 @@ class CommentResponse(CommentBase):
     complaint_id: int
     created_at: datetime
 
+class CommentTreeResponse(CommentResponse):
+    reply_count: int = 0
+    replies: List["CommentTreeResponse"] = []
+
+CommentTreeResponse.update_forward_refs()
+
 class LikeResponse(BaseModel):
     username: str
     complaint_id: int
@@ -197,6 +216,31 @@ class ComplaintListResponse(BaseModel):
     Complaint: ComplaintSchema
     ComplaintType : ComplaintTypeBase
     UserProfile: ProfilePicture
+    my_vote: Union[int, None] = None
+
+class ComplaintSearchResponse(ComplaintListResponse):
+    rank: float
+
+class DuplicateComplaint(BaseModel):
+    id: int
+    complaint_title: str
+    like_count: int
+    created_at: datetime
+    distance: float
+    similarity: float
+
+class DuplicateComplaintsDetail(BaseModel):
+    message: str
+    duplicates: List[DuplicateComplaint]
+
+class DuplicateComplaintsConflict(BaseModel):
+    detail: DuplicateComplaintsDetail
+
+class ComplaintNearbyResponse(BaseModel):
+    Complaint: ComplaintLocationSchema
+    ComplaintType : ComplaintTypeBase
+    UserProfile: ProfilePicture
+    distance: float
 
 class ComplaintResponse(BaseModel):
     Complaint: ComplaintResponseBase
@@ -259,3 +303,50 @@ class CouncillorBase(BaseModel):
 
     class Config:
         orm_mode = True
+
+class WardStatsSummary(BaseModel):
+    created: int
+    completed: int
+    pending: int
+    votes: int
+    median_resolution_hours: Union[float, None] = None
+    mean_resolution_hours: Union[float, None] = None
+
+class WardTypeStats(WardStatsSummary):
+    complaint_type: int
+    type_name: str
+
+class WardDayStats(BaseModel):
+    day: date
+    created: int
+    completed: int
+
+class TopPendingComplaint(BaseModel):
+    id: int
+    complaint_title: str
+    complaint_type: int
+    like_count: int
+    created_at: datetime
+
+class WardDashboardResponse(BaseModel):
+    ward_id: int
+    since: date
+    until: date
+    totals: WardStatsSummary
+    by_type: List[WardTypeStats]
+    daily: List[WardDayStats]
+    top_pending: List[TopPendingComplaint]
+
+class WorkQueueItem(BaseModel):
+    id: int
+    complaint_title: str
+    complaint_type: int
+    type_name: str
+    ward_id: int
+    like_count: int
+    dislike_count: int
+    no_of_comments: int
+    completed_status: str
+    created_at: datetime
+    last_update_at: Union[datetime, None] = None
+    latest_update: Union[ComplaintUpdateResponse, None] = None
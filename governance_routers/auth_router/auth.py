@@ -1,15 +1,21 @@
 import imp
 from datetime import timedelta
+from typing import Union
 
 from database import schemas
-from database.dependency import get_db
+from database.crud import get_ward_servant_by_username
+from database.dependency import get_async_db, get_db
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from flask import redirect
 from governance_routers.auth_router.auth_functions import (
     authenticate_user, create_access_token, get_current_active_user,
-    sign_up_user)
+    get_current_session_id, sign_up_user)
 from router.auth.config import Settings, get_settings
+from router.auth.rate_limit import login_rate_limiter
+from router.auth.refresh_tokens import (AUTHORITY, issue_refresh_token,
+                                        revoke_session, rotate_refresh_token)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 router = APIRouter(
@@ -22,21 +28,48 @@ router = APIRouter(
 async def signup(user: schemas.WardServantCreate,db: Session = Depends(get_db)):
     return await sign_up_user(db,user)
 
-@router.post("/token/", response_model=schemas.Token)
-async def login_for_access_token(response: Response,form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db),settings:Settings=Depends(get_settings)):
-    user = authenticate_user(db, form_data)
+@router.post("/token/", response_model=schemas.Token, dependencies=[Depends(login_rate_limiter.dependency("authority"))])
+async def login_for_access_token(response: Response,form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db),settings:Settings=Depends(get_settings)):
+    user = await authenticate_user(db, form_data)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    refresh_token, session_id = await issue_refresh_token(db, user.username, AUTHORITY)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "sid": session_id}, expires_delta=access_token_expires
     )
     response.set_cookie(key="access_token",value=f"Bearer {access_token}", httponly=True, samesite= "strict")  #set HttpOnly cookie in response
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# new access token for a refresh token, without repeating the password and totp checks
+@router.post("/refresh/", response_model=schemas.Token)
+def refresh_access_token(response: Response, body: schemas.RefreshTokenRequest, db: Session = Depends(get_db), settings:Settings=Depends(get_settings)):
+    username, session_id, refresh_token = rotate_refresh_token(db, body.refresh_token, AUTHORITY)
+    user = get_ward_servant_by_username(db, username)
+    if not user or not user.is_active:
+        revoke_session(db, session_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username, "sid": session_id}, expires_delta=access_token_expires
+    )
+    response.set_cookie(key="access_token",value=f"Bearer {access_token}", httponly=True, samesite= "strict")
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout/", response_model=schemas.MessageWithStatus)
+def logout(response: Response, session_id: Union[str, None] = Depends(get_current_session_id), db: Session = Depends(get_db)):
+    if session_id:
+        revoke_session(db, session_id)
+    response.delete_cookie(key="access_token")
+    return {"status_code": 200, "content": {"message": "Logged out"}}
 
 
 @router.get("/users/me/items/")
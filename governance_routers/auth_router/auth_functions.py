@@ -10,7 +10,8 @@ from fastapi import Depends, HTTPException, status
 # from api.utils import OAuth2PasswordBearerWithCookie
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.responses import StreamingResponse
 
@@ -19,19 +20,20 @@ from database.crud import (get_ward_servant_by_email,
                            get_ward_servant_by_username, get_ward_servant_info)
 from database.dependency import get_db
 from router.auth.config import Settings, get_settings
+from router.auth.password_hashing import password_hasher
+from router.auth.refresh_tokens import is_session_revoked
 
 auth_config_settings:Settings = get_settings()
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/authority/auth/token")
 
 # get password hash
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password:str, hashed_password:str, ):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password:str, hashed_password:str, ):
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
 
 # create access token
 def create_access_token(data: dict, expires_delta: Union[timedelta , None] = None):
@@ -44,15 +46,20 @@ def create_access_token(data: dict, expires_delta: Union[timedelta , None] = Non
     encoded_jwt = jwt.encode(to_encode, auth_config_settings.SECRET_KEY, algorithm=auth_config_settings.ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db:Session, form_data: schemas.UserLogin):
-    user = get_ward_servant_by_username(db, form_data.username)
+async def authenticate_user(db:AsyncSession, form_data: schemas.UserLogin):
+    user = (await db.execute(select(models.WardServant).where(models.WardServant.username == form_data.username))).scalars().first()
     if not user:
         return False
-    if not verify_password(form_data.password[:-6], user.hashed_password):
+    is_valid, new_hash = await verify_password(form_data.password[:-6], user.hashed_password)
+    if not is_valid:
         return False
     totp = pyotp.TOTP(user.secret_key)
     if not totp.verify(form_data.password[-6:]):
         return False
+    # transparently upgrade hashes made with an older cost factor
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 #create user function
@@ -62,7 +69,7 @@ async def create_user(db: Session, user: schemas.WardServantCreate):
         raise HTTPException(status_code=400, detail="You are not allowed to Sign up")
     if user_info.password != user.temp_password:
         raise HTTPException(status_code=400, detail="temp_password is not correct")
-    user.password = get_password_hash(user.password)
+    user.password = await get_password_hash(user.password)
     db_user = models.WardServant(
         id = user_info.id,
         username = user_info.username,
@@ -107,12 +114,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme),db: Session = Dep
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    if is_session_revoked(payload.get("sid")):
+        raise credentials_exception
     user = get_ward_servant_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
 
 
+# session id (sid claim) of an access token we signed, for logout. expiry is not checked:
+# the access token lasts minutes, its session's refresh tokens last days and must still end
+async def get_current_session_id(token: str = Depends(oauth2_scheme)):
+    try:
+        payload = jwt.decode(token, auth_config_settings.SECRET_KEY, algorithms=[auth_config_settings.ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload.get("sid")
+
+
 async def sign_up_user(db: Session,user: schemas.WardServantCreate):
     if not user.email:
         raise HTTPException(status_code=400, detail="email is required")
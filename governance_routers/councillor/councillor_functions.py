@@ -1,11 +1,18 @@
+import datetime
 import imp
+from typing import Union
 
 from database.db import SessionLocal
 from database.dependency import get_db
-from database.models import Complaint, ComplaintUpdate, WardServantProfile
+from database.models import (Complaint, ComplaintStatus, ComplaintType,
+                             ComplaintUpdate, WardServantProfile)
 from database.schemas import ComplaintUpdateBase, UserBase
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import Depends, HTTPException
 from governance_routers.auth_router.auth_functions import get_current_user
+from router.complaints.vote_buffer import vote_buffer
+from router.pagination import decode_cursor, encode_cursor
+from router.ward.ward_rollups import ward_dashboard
+from sqlalchemy import and_, func, or_, select
 
 
 def give_complaint_updates(complaint_update: ComplaintUpdateBase,db: SessionLocal = Depends(get_db), current_user: UserBase = Depends(get_current_user)):
@@ -18,11 +25,87 @@ def give_complaint_updates(complaint_update: ComplaintUpdateBase,db: SessionLoca
         complaint_updates = ComplaintUpdate(
             complaint_id = complaint.id,
             update_text = complaint_update.update_text,
-            ward_servant_username = current_user.username
+            ward_servant_username = current_user.username,
+            created_at = datetime.datetime.now()
         )
         db.add(complaint_updates)
+        db.query(ComplaintStatus).filter(ComplaintStatus.complaint_id == complaint.id).update(
+            {ComplaintStatus.last_update_at: complaint_updates.created_at}, synchronize_session=False
+        )
         db.commit()
         db.refresh(complaint_updates)
         return complaint_updates
     else:
         raise HTTPException(status_code=404, detail="Complaint not found")
+
+def get_ward_dashboard(db: SessionLocal, current_user: UserBase, days: int):
+    ward_servant = db.query(WardServantProfile).filter(WardServantProfile.username == current_user.username).first()
+    if not ward_servant:
+        raise HTTPException(status_code=404, detail="Ward servant not found")
+    until = datetime.date.today()
+    return ward_dashboard(db, ward_servant.ward_id, until - datetime.timedelta(days=days - 1), until)
+
+# work queue orders: (sort key, its python type, newest first); ties go to the lower id in ascending orders
+WORK_QUEUE_SORTS = {
+    "votes": (Complaint.like_count, int, True),
+    "oldest": (Complaint.created_at, datetime.datetime, False),
+    # longest without an update from the ward servant, counting from filing when never updated
+    "stale": (func.coalesce(ComplaintStatus.last_update_at, Complaint.created_at), datetime.datetime, False),
+}
+
+def get_work_queue(db: SessionLocal, current_user: UserBase, status: str = "PENDING", sort: str = "votes", limit: int = 30, cursor: Union[str, None] = None):
+    sort_column, key_type, descending = WORK_QUEUE_SORTS[sort]
+    # the latest update of each row is an outer join on its max id, a seek on the complaint_id
+    # index per row in the same statement rather than a query per card
+    latest_update_id = select(func.max(ComplaintUpdate.id)).where(
+        ComplaintUpdate.complaint_id == ComplaintStatus.complaint_id
+    ).correlate(ComplaintStatus).scalar_subquery()
+    query = db.query(
+        Complaint.id, Complaint.complaint_title, Complaint.complaint_type, ComplaintType.type_name, Complaint.ward_id,
+        Complaint.like_count, Complaint.dislike_count, Complaint.no_of_comments, Complaint.completed_status,
+        Complaint.created_at, ComplaintStatus.last_update_at, sort_column.label("sort_key"),
+        ComplaintUpdate.id.label("update_id"), ComplaintUpdate.update_text, ComplaintUpdate.created_at.label("update_created_at"),
+    ).select_from(ComplaintStatus).join(
+        Complaint, Complaint.id == ComplaintStatus.complaint_id
+    ).join(
+        ComplaintType, ComplaintType.id == Complaint.complaint_type
+    ).outerjoin(
+        ComplaintUpdate, ComplaintUpdate.id == latest_update_id
+    ).filter(
+        # seek on ix_complaint_statuses_servant_status
+        ComplaintStatus.ward_servant_username == current_user.username, ComplaintStatus.completed_status == status,
+    )
+    if cursor:
+        last_key, last_id = decode_cursor(cursor, sort, key_type)
+        if descending:
+            query = query.filter(or_(sort_column < last_key, and_(sort_column == last_key, Complaint.id < last_id)))
+        else:
+            query = query.filter(or_(sort_column > last_key, and_(sort_column == last_key, Complaint.id > last_id)))
+    if descending:
+        query = query.order_by(sort_column.desc(), Complaint.id.desc())
+    else:
+        query = query.order_by(sort_column, Complaint.id)
+    rows = query.limit(limit).all()
+
+    items = []
+    for row in rows:
+        items.append({
+            "id": row.id,
+            "complaint_title": row.complaint_title,
+            "complaint_type": row.complaint_type,
+            "type_name": row.type_name,
+            "ward_id": row.ward_id,
+            "like_count": row.like_count + (vote_buffer.pending(row.id) if vote_buffer.enabled else 0),
+            "dislike_count": row.dislike_count,
+            "no_of_comments": row.no_of_comments,
+            "completed_status": row.completed_status,
+            "created_at": row.created_at,
+            "last_update_at": row.last_update_at,
+            "latest_update": {
+                "id": row.update_id, "complaint_id": row.id, "update_text": row.update_text, "created_at": row.update_created_at,
+            } if row.update_id is not None else None,
+        })
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(sort, rows[-1].sort_key, rows[-1].id)
+    return items, next_cursor
@@ -1,12 +1,14 @@
+from typing import List, Union
+
 from database.db import SessionLocal
 from database.dependency import get_db
 from database.schemas import (CommentCreate, CommentResponse,
                               ComplaintUpdateBase, ComplaintUpdateResponse,
-                              UserBase)
-from fastapi import APIRouter, Depends, Query
+                              UserBase, WardDashboardResponse, WorkQueueItem)
+from fastapi import APIRouter, Depends, Query, Response
 from governance_routers.auth_router.auth_functions import get_current_user
-from governance_routers.councillor.councillor_functions import \
-    give_complaint_updates
+from governance_routers.councillor.councillor_functions import (
+    get_ward_dashboard, get_work_queue, give_complaint_updates)
 from router.complaints.complaints_functions import create_comment
 
 router = APIRouter(
@@ -16,9 +18,22 @@ router = APIRouter(
 )
 
 @router.post("/make_updates", response_model= ComplaintUpdateResponse)
-async def make_updates(complaint_update:ComplaintUpdateBase,db: SessionLocal = Depends(get_db), current_user: UserBase = Depends(get_current_user)):
+def make_updates(complaint_update:ComplaintUpdateBase,db: SessionLocal = Depends(get_db), current_user: UserBase = Depends(get_current_user)):
     return give_complaint_updates(complaint_update,db, current_user)
 
+# figures for complaints filed in the last `days` days, read from the ward rollups
+@router.get("/dashboard", response_model=WardDashboardResponse)
+def dashboard(days: int = Query(default=30, ge=1, le=366), db: SessionLocal = Depends(get_db), current_user: UserBase = Depends(get_current_user)):
+    return get_ward_dashboard(db, current_user, days)
+
+# complaints assigned to the ward servant, keyset paginated through the X-Next-Cursor header
+@router.get("/work_queue", response_model=List[WorkQueueItem])
+def work_queue(response: Response, status: str = Query(default="PENDING", regex="^(PENDING|COMPLETED)$"), sort: str = Query(default="votes", regex="^(votes|oldest|stale)$"), limit: int = Query(default=30, ge=1, le=100), cursor: Union[str, None] = None, db: SessionLocal = Depends(get_db), current_user: UserBase = Depends(get_current_user)):
+    items, next_cursor = get_work_queue(db, current_user, status, sort, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
 # @router.post("{complaint_id}/comment", response_model= CommentResponse)
 # async def comment(complaint_id:int, comment:CommentCreate,db: SessionLocal = Depends(get_db), current_user: UserBase = Depends(get_current_user)):
 #     return create_comment(db, complaint_id, comment, current_user)
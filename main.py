@@ -1,29 +1,58 @@
-from fastapi import Depends, FastAPI
+import asyncio
+
+from fastapi import Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from requests import Session
 
-from database.db import engine
-from database.dependency import get_db
-from database.models import (Base, ComplaintSubType, ComplaintType, District,
-                             Municipality, Ward)
+from app_factory import create_app
+from database.config import db_settings
+from database.db import async_engine, engine
+from database.mail_queue import MailQueueWorker
+from database.models import Base
 from database.schemas import UserBase
 from governance_routers.auth_router import auth as auth_router
 from governance_routers.councillor import councillor_router
 from router.auth import auth
 from router.auth.auth_functions import get_current_active_user
+from router.auth.disposable_email import disposable_email_checker
 from router.complaints import complaints_router
+from router.complaints.vote_buffer import vote_buffer
+from router.metrics import metrics_router
+from router.metrics.instrumentation import (InstrumentationMiddleware,
+                                            instrument_engine)
 from router.users import users_router
 from router.ward import ward_routes
+from router.zone.zone_cache import zone_cache
 
 # creates initial database tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()#docs_url=None, redoc_url=None,openapi_url=None)
+app = create_app()#docs_url=None, redoc_url=None,openapi_url=None)
 
 # @app.on_event("startup")
 # async def startup():
 #     create_zones_csv()
 
+mail_queue_worker = MailQueueWorker()
+
+@app.on_event("startup")
+async def start_mail_queue():
+    if mail_queue_worker.settings.MAIL_QUEUE_IN_PROCESS:
+        asyncio.create_task(mail_queue_worker.run())
+
+@app.on_event("startup")
+async def start_vote_buffer():
+    if vote_buffer.enabled:
+        if db_settings.VOTE_BUFFER_REPLAY_ON_STARTUP:
+            await vote_buffer.replay()
+        asyncio.create_task(vote_buffer.run())
+
+@app.on_event("shutdown")
+async def shutdown():
+    mail_queue_worker.stop()
+    vote_buffer.stop()
+    await vote_buffer.flush()
+    await disposable_email_checker.aclose()
+
 
 origins = [
     "http://localhost:3000",
@@ -36,8 +65,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# outermost, so the timings cover every other middleware and the mounted apps
+app.add_middleware(InstrumentationMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 app.include_router(
     auth.router,
     )
@@ -53,7 +88,12 @@ app.include_router(
     ward_routes.router
     )
 
-authority = FastAPI()
+app.include_router(
+    metrics_router.router
+    )
+
+# mounted under app, which already compresses their responses
+authority = create_app(compress=False)
 
 authority.include_router(
     auth_router.router,
@@ -75,38 +115,27 @@ async def validate_login(current_user: UserBase = Depends(get_current_active_use
 def read_sub():
     return {"message": "Hello World from sub API"}
 
-zone = FastAPI()
+zone = create_app(compress=False)
+# the geography and taxonomy tables rarely change, they are served from zone_cache
 @zone.get("/districts_and_complaint_types")
-def read_districts_and_complaints(db:Session = Depends(get_db)):
-    districts = db.query(District).all()
-    complaints_types = db.query(ComplaintType).all()
-    return {"districts":districts, "complaints_types":complaints_types}
+def read_districts_and_complaints(request: Request):
+    return zone_cache.respond(request, "districts_and_complaint_types")
 
 @zone.get("/municipalities/{district_id}")
-def read_municipalities(district_id:int, db:Session = Depends(get_db)):
-    municipalities = db.query(Municipality).filter(
-        Municipality.district_id == district_id
-    ).all()
-    return municipalities
+def read_municipalities(district_id:int, request: Request):
+    return zone_cache.respond(request, "municipalities", district_id)
 
 @zone.get("/wards/{municipality_id}")
-def read_wards(municipality_id:int,db:Session = Depends(get_db)):
-    wards = db.query(Ward).filter(
-        Ward.municipality_id == municipality_id
-    ).all()
-    return wards
+def read_wards(municipality_id:int, request: Request):
+    return zone_cache.respond(request, "wards", municipality_id)
 
 @zone.get("/districts")
-def read_districts(db:Session = Depends(get_db)):
-    districts = db.query(District).all()
-    return districts
+def read_districts(request: Request):
+    return zone_cache.respond(request, "districts")
 
 @zone.get("/complaint_subtypes/{complaint_id}")
-def read_subcomplaints(complaint_id:int,db:Session = Depends(get_db)):
-    subcomplaints = db.query(ComplaintSubType).filter(
-        ComplaintSubType.parent_type == complaint_id
-    ).all()
-    return subcomplaints
+def read_subcomplaints(complaint_id:int, request: Request):
+    return zone_cache.respond(request, "complaint_subtypes", complaint_id)
 
 app.mount("/authority", authority)
 app.mount("/zone", zone)
@@ -0,0 +1,116 @@
+import argparse
+
+from database.db import SessionLocal
+from router.complaints.complaint_duplicates import backfill_signatures
+from router.complaints.complaint_search import rebuild_search_index
+from router.complaints.vote_buffer import rebuild_like_counts_statement
+from router.users.user_stats import reconcile_complaint_counters
+from router.ward.ward_rollups import (rebuild_vote_totals_statement,
+                                      rebuild_ward_rollups)
+from router.zone.zone_cache import bump_zone_generation
+
+
+def reconcile_user_stats(args):
+    db = SessionLocal()
+    try:
+        drift = reconcile_complaint_counters(db, fix=not args.dry_run)
+    finally:
+        db.close()
+    for username, stored_completed, completed, stored_pending, pending in drift:
+        print("{}: completed {} -> {}, pending {} -> {}".format(username, stored_completed, completed, stored_pending, pending))
+    print("{} profile(s) {}".format(len(drift), "drifted" if args.dry_run else "repaired"))
+
+
+def rebuild_vote_counts(args):
+    db = SessionLocal()
+    try:
+        updated = db.execute(rebuild_like_counts_statement()).rowcount
+        # the ward dashboard's vote totals are sums of the same counters
+        db.execute(rebuild_vote_totals_statement())
+        db.commit()
+    finally:
+        db.close()
+    print("rebuilt like_count for {} complaint(s)".format(updated))
+
+
+def prune_expired_refresh_tokens(args):
+    # imported here so the other commands run without the auth settings
+    from router.auth.refresh_tokens import prune_refresh_tokens
+
+    db = SessionLocal()
+    try:
+        deleted = prune_refresh_tokens(db)
+    finally:
+        db.close()
+    print("deleted {} expired refresh token(s)".format(deleted))
+
+
+def rebuild_search(args):
+    db = SessionLocal()
+    try:
+        indexed = rebuild_search_index(db)
+    finally:
+        db.close()
+    print("search index rebuilt over {} complaint(s)".format(indexed))
+
+
+def sign_complaints(args):
+    db = SessionLocal()
+    try:
+        signed = backfill_signatures(db)
+    finally:
+        db.close()
+    print("signed {} complaint(s) for the duplicate check".format(signed))
+
+
+def rebuild_ward_stats(args):
+    db = SessionLocal()
+    try:
+        counted = rebuild_ward_rollups(db)
+    finally:
+        db.close()
+    print("ward rollups rebuilt from {} complaint(s)".format(counted))
+
+
+def invalidate_zone(args):
+    db = SessionLocal()
+    try:
+        bump_zone_generation(db)
+        db.commit()
+    finally:
+        db.close()
+    print("zone cache invalidated; workers reload within their check interval")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reconcile = commands.add_parser("reconcile-user-stats", help="rebuild per-user complaint counters and report drift")
+    reconcile.add_argument("--dry-run", action="store_true", help="only report drift")
+    reconcile.set_defaults(func=reconcile_user_stats)
+
+    rebuild_votes = commands.add_parser("rebuild-vote-counts", help="recompute complaints.like_count from the votes table, and the ward vote totals from it")
+    rebuild_votes.set_defaults(func=rebuild_vote_counts)
+
+    prune_tokens = commands.add_parser("prune-refresh-tokens", help="delete expired refresh tokens")
+    prune_tokens.set_defaults(func=prune_expired_refresh_tokens)
+
+    search_index = commands.add_parser("rebuild-search-index", help="create the complaint full-text index and backfill it")
+    search_index.set_defaults(func=rebuild_search)
+
+    signatures = commands.add_parser("backfill-complaint-signatures", help="compute duplicate-check signatures for complaints without one")
+    signatures.set_defaults(func=sign_complaints)
+
+    ward_stats = commands.add_parser("rebuild-ward-stats", help="recompute the ward dashboard rollups from the complaints table")
+    ward_stats.set_defaults(func=rebuild_ward_stats)
+
+    zone = commands.add_parser("invalidate-zone-cache", help="make every api worker reload the geography and taxonomy cache")
+    zone.set_defaults(func=invalidate_zone)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Feed keyset indexes
+
+Revision ID: 5b1e7c9d2a40
+Revises: f8e0da73d6b7
+Create Date: 2026-10-18 10:02:11.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c9d2a40'
+down_revision = 'f8e0da73d6b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_complaints_ward_status_likes', 'complaints', ['ward_id', 'completed_status', 'like_count', 'id'], unique=False)
+    op.create_index('ix_complaints_ward_status_created', 'complaints', ['ward_id', 'completed_status', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_complaints_ward_status_created', table_name='complaints')
+    op.drop_index('ix_complaints_ward_status_likes', table_name='complaints')
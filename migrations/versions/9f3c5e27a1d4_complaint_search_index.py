@@ -0,0 +1,42 @@
+"""Complaint search index
+
+Revision ID: 9f3c5e27a1d4
+Revises: 4d9b2f61c8a7
+Create Date: 2026-10-18 19:27:51.604218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3c5e27a1d4'
+down_revision = '4d9b2f61c8a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5("
+            "complaint_title, complaint_desc, content='complaints', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE complaints ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(complaint_title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(complaint_desc, '')), 'B')) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_complaints_search_vector ON complaints USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS complaints_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_complaints_search_vector")
+        op.execute("ALTER TABLE complaints DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,29 @@
+"""Cache generations
+
+Revision ID: a93f5d20c7e4
+Revises: e47b0c9d3f61
+Create Date: 2026-10-18 23:02:37.164820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93f5d20c7e4'
+down_revision = 'e47b0c9d3f61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    cache_generations = op.create_table('cache_generations',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_generations, [{'name': 'zone', 'generation': 0}])
+
+
+def downgrade() -> None:
+    op.drop_table('cache_generations')
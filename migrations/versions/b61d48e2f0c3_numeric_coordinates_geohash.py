@@ -0,0 +1,83 @@
+"""Numeric coordinates and geohash
+
+Revision ID: b61d48e2f0c3
+Revises: 9f3c5e27a1d4
+Create Date: 2026-10-18 20:03:37.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b61d48e2f0c3'
+down_revision = '9f3c5e27a1d4'
+branch_labels = None
+depends_on = None
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+# frozen copy of router.geohash.encode at precision 9, so later changes there cannot alter this migration
+def _geohash(latitude, longitude, precision=9):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if target >= middle:
+            value = value * 2 + 1
+            bounds[0] = middle
+        else:
+            value = value * 2
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.drop_index('ix_complaints_latitude', table_name='complaints')
+    op.drop_index('ix_complaints_longitude', table_name='complaints')
+    if bind.dialect.name == 'postgresql':
+        for name in ('latitude', 'longitude'):
+            op.execute(
+                "ALTER TABLE complaints ALTER COLUMN {0} TYPE double precision "
+                "USING NULLIF(trim({0}), '')::double precision".format(name)
+            )
+    else:
+        # sqlite rebuilds the table, copying the strings into REAL columns converts them
+        with op.batch_alter_table('complaints') as batch_op:
+            batch_op.alter_column('latitude', existing_type=sa.String(length=20), type_=sa.Float())
+            batch_op.alter_column('longitude', existing_type=sa.String(length=20), type_=sa.Float())
+        op.execute("UPDATE complaints SET latitude = NULL WHERE typeof(latitude) NOT IN ('real', 'integer')")
+        op.execute("UPDATE complaints SET longitude = NULL WHERE typeof(longitude) NOT IN ('real', 'integer')")
+    op.add_column('complaints', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    complaints = sa.table('complaints', sa.column('id'), sa.column('latitude'), sa.column('longitude'), sa.column('geohash'))
+    rows = bind.execute(sa.select(complaints.c.id, complaints.c.latitude, complaints.c.longitude).where(
+        complaints.c.latitude.isnot(None), complaints.c.longitude.isnot(None)
+    )).all()
+    if rows:
+        bind.execute(
+            complaints.update().where(complaints.c.id == sa.bindparam('complaint_id')).values(geohash=sa.bindparam('hash')),
+            [{'complaint_id': row.id, 'hash': _geohash(row.latitude, row.longitude)} for row in rows],
+        )
+    op.create_index('ix_complaints_geohash_location', 'complaints', ['geohash', 'latitude', 'longitude'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_complaints_geohash_location', table_name='complaints')
+    with op.batch_alter_table('complaints') as batch_op:
+        batch_op.drop_column('geohash')
+        batch_op.alter_column('latitude', existing_type=sa.Float(), type_=sa.String(length=20), postgresql_using='latitude::varchar(20)')
+        batch_op.alter_column('longitude', existing_type=sa.Float(), type_=sa.String(length=20), postgresql_using='longitude::varchar(20)')
+        batch_op.create_index('ix_complaints_latitude', ['latitude'], unique=False)
+        batch_op.create_index('ix_complaints_longitude', ['longitude'], unique=False)
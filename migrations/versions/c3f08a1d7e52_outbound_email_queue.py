@@ -0,0 +1,42 @@
+"""Outbound email queue
+
+Revision ID: c3f08a1d7e52
+Revises: 5b1e7c9d2a40
+Create Date: 2026-10-18 11:20:43.091166
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f08a1d7e52'
+down_revision = '5b1e7c9d2a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('outbound_emails',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipient', sa.String(), nullable=False),
+    sa.Column('subject', sa.String(length=200), nullable=False),
+    sa.Column('body_html', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_by', sa.String(length=32), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint("status in ('PENDING','SENDING','SENT','FAILED')"),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbound_emails_id'), 'outbound_emails', ['id'], unique=False)
+    op.create_index('ix_outbound_emails_status_next_attempt', 'outbound_emails', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbound_emails_status_next_attempt', table_name='outbound_emails')
+    op.drop_index(op.f('ix_outbound_emails_id'), table_name='outbound_emails')
+    op.drop_table('outbound_emails')
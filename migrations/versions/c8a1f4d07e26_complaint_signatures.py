@@ -0,0 +1,31 @@
+"""Complaint signatures
+
+Revision ID: c8a1f4d07e26
+Revises: b61d48e2f0c3
+Create Date: 2026-10-18 20:48:12.730615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8a1f4d07e26'
+down_revision = 'b61d48e2f0c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing complaints are signed by `python manage.py backfill-complaint-signatures`;
+    # until then the duplicate check signs them on the fly
+    op.create_table('complaint_signatures',
+    sa.Column('complaint_id', sa.Integer(), nullable=False),
+    sa.Column('signature', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['complaint_id'], ['complaints.id'], ),
+    sa.PrimaryKeyConstraint('complaint_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('complaint_signatures')
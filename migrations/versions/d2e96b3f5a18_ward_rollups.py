@@ -0,0 +1,52 @@
+"""Ward rollups
+
+Revision ID: d2e96b3f5a18
+Revises: c8a1f4d07e26
+Create Date: 2026-10-18 21:36:44.091327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e96b3f5a18'
+down_revision = 'c8a1f4d07e26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # complaints resolved before this revision keep a NULL completed_at: they count as
+    # resolved on the dashboard but stay out of the resolution times.
+    # fill the new tables with `python manage.py rebuild-ward-stats`
+    op.add_column('complaints', sa.Column('completed_at', sa.DateTime(), nullable=True))
+    op.create_table('ward_daily_stats',
+    sa.Column('ward_id', sa.Integer(), nullable=False),
+    sa.Column('complaint_type', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('vote_total', sa.Integer(), nullable=False),
+    sa.Column('resolution_seconds', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['complaint_type'], ['complaint_types.id'], ),
+    sa.ForeignKeyConstraint(['ward_id'], ['wards.ward_id'], ),
+    sa.PrimaryKeyConstraint('ward_id', 'complaint_type', 'day')
+    )
+    op.create_table('ward_resolution_buckets',
+    sa.Column('ward_id', sa.Integer(), nullable=False),
+    sa.Column('complaint_type', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('complaint_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['complaint_type'], ['complaint_types.id'], ),
+    sa.ForeignKeyConstraint(['ward_id'], ['wards.ward_id'], ),
+    sa.PrimaryKeyConstraint('ward_id', 'complaint_type', 'day', 'bucket')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ward_resolution_buckets')
+    op.drop_table('ward_daily_stats')
+    with op.batch_alter_table('complaints') as batch_op:
+        batch_op.drop_column('completed_at')
@@ -0,0 +1,36 @@
+"""Councillor work queue
+
+Revision ID: e47b0c9d3f61
+Revises: d2e96b3f5a18
+Create Date: 2026-10-18 22:14:05.518209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e47b0c9d3f61'
+down_revision = 'd2e96b3f5a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('complaint_statuses', sa.Column('last_update_at', sa.DateTime(), nullable=True))
+    # resolving a complaint only ever set complaints.completed_status
+    op.execute(
+        "UPDATE complaint_statuses SET completed_status = "
+        "(SELECT completed_status FROM complaints WHERE complaints.id = complaint_statuses.complaint_id)"
+    )
+    op.execute(
+        "UPDATE complaint_statuses SET last_update_at = "
+        "(SELECT max(created_at) FROM complaint_updates WHERE complaint_updates.complaint_id = complaint_statuses.complaint_id)"
+    )
+    op.create_index('ix_complaint_statuses_servant_status', 'complaint_statuses', ['ward_servant_username', 'completed_status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_complaint_statuses_servant_status', table_name='complaint_statuses')
+    with op.batch_alter_table('complaint_statuses') as batch_op:
+        batch_op.drop_column('last_update_at')
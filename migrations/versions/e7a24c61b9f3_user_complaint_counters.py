@@ -0,0 +1,34 @@
+"""User complaint counters
+
+Revision ID: e7a24c61b9f3
+Revises: c3f08a1d7e52
+Create Date: 2026-10-18 12:04:17.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a24c61b9f3'
+down_revision = 'c3f08a1d7e52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user_profiles', sa.Column('completed_complaints_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user_profiles', sa.Column('pending_complaints_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE user_profiles SET
+            completed_complaints_count = (SELECT COUNT(*) FROM complaints
+                WHERE complaints.username = user_profiles.username AND complaints.completed_status = 'COMPLETED'),
+            pending_complaints_count = (SELECT COUNT(*) FROM complaints
+                WHERE complaints.username = user_profiles.username AND complaints.completed_status = 'PENDING')
+    """)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user_profiles') as batch_op:
+        batch_op.drop_column('pending_complaints_count')
+        batch_op.drop_column('completed_complaints_count')
@@ -1,13 +1,20 @@
 from datetime import timedelta
+from typing import Union
 
 from database import schemas
-from database.dependency import get_db
-from fastapi import (APIRouter, BackgroundTasks, Depends, HTTPException,
-                     Response, status)
+from database.crud import get_user_by_username
+from database.dependency import get_async_db, get_db
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from router.auth.auth_functions import (authenticate_user, create_access_token,
-                                        sign_up_user, verify_user)
+from router.auth.auth_functions import (access_token_claims,
+                                        authenticate_user, create_access_token,
+                                        get_current_session_id, sign_up_user,
+                                        verify_user)
 from router.auth.config import Settings, get_settings
+from router.auth.rate_limit import login_rate_limiter
+from router.auth.refresh_tokens import (CITIZEN, issue_refresh_token,
+                                        revoke_session, rotate_refresh_token)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 router = APIRouter(
@@ -18,25 +25,52 @@ router = APIRouter(
 
 
 @router.post("/signup/", response_model=schemas.MessageWithStatus)
-async def signup(user: schemas.UserCreate,background_tasks: BackgroundTasks,db: Session = Depends(get_db)):
-    return await sign_up_user(db,user,background_tasks)
+async def signup(user: schemas.UserCreate,db: Session = Depends(get_db)):
+    return await sign_up_user(db,user)
             
 @router.get("/verification/{token}/")#, status_code=201, response_model=schemas.MessageWithStatus)
 def verification(token: str, db: Session = Depends(get_db)):
     return verify_user(db,token)
 
-@router.post("/token/", response_model=schemas.Token)
-async def login_for_access_token(response: Response,form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db),settings:Settings=Depends(get_settings)):
-    user = authenticate_user(db, form_data)
+@router.post("/token/", response_model=schemas.Token, dependencies=[Depends(login_rate_limiter.dependency("citizen"))])
+async def login_for_access_token(response: Response,form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db),settings:Settings=Depends(get_settings)):
+    user = await authenticate_user(db, form_data)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    refresh_token, session_id = await issue_refresh_token(db, user.username, CITIZEN)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=access_token_claims(user, session_id), expires_delta=access_token_expires
     )
     response.set_cookie(key="access_token",value=f"Bearer {access_token}", httponly=True,samesite="strict")  #set HttpOnly cookie in response
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# new access token for a refresh token, without repeating the password check
+@router.post("/refresh/", response_model=schemas.Token)
+def refresh_access_token(response: Response, body: schemas.RefreshTokenRequest, db: Session = Depends(get_db), settings:Settings=Depends(get_settings)):
+    username, session_id, refresh_token = rotate_refresh_token(db, body.refresh_token, CITIZEN)
+    user = get_user_by_username(db, username)
+    if not user or not user.is_active:
+        revoke_session(db, session_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=access_token_claims(user, session_id), expires_delta=access_token_expires
+    )
+    response.set_cookie(key="access_token",value=f"Bearer {access_token}", httponly=True,samesite="strict")
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout/", response_model=schemas.MessageWithStatus)
+def logout(response: Response, session_id: Union[str, None] = Depends(get_current_session_id), db: Session = Depends(get_db)):
+    if session_id:
+        revoke_session(db, session_id)
+    response.delete_cookie(key="access_token")
+    return {"status_code": 200, "content": {"message": "Logged out"}}
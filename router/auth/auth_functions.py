@@ -1,35 +1,39 @@
 from datetime import datetime, timedelta
 from typing import Union
 
-from fastapi import BackgroundTasks, Depends, HTTPException, status
+from fastapi import Depends, HTTPException, status
 from fastapi.responses import RedirectResponse
 # from api.utils import OAuth2PasswordBearerWithCookie
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import EmailStr
-from requests import request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from database import models, schemas
 from database.crud import (get_user_by_email, get_user_by_temp_email,
                            get_user_by_temp_username, get_user_by_username)
-from database.dependency import get_db
+from database.dependency import get_async_db
 from database.email_verification import send_verification_email
 from router.auth.config import Settings, get_settings
+from router.auth.disposable_email import disposable_email_checker
+from router.auth.password_hashing import password_hasher
+from router.auth.principal_cache import principal_cache
+from router.auth.refresh_tokens import is_session_revoked
 
 auth_config_settings:Settings = get_settings()
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 # get password hash
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password:str, hashed_password:str, ):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password:str, hashed_password:str, ):
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
 
 # create access token
 def create_access_token(data: dict, expires_delta: Union[timedelta , None] = None):
@@ -42,29 +46,33 @@ def create_access_token(data: dict, expires_delta: Union[timedelta , None] = Non
     encoded_jwt = jwt.encode(to_encode, auth_config_settings.SECRET_KEY, algorithm=auth_config_settings.ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db:Session, form_data: schemas.UserLogin):
-    user = get_user_by_username(db, form_data.username)
+async def authenticate_user(db:AsyncSession, form_data: schemas.UserLogin):
+    user = (await db.execute(select(models.User).where(models.User.username == form_data.username))).scalars().first()
     if not user:
         return False
-    if not verify_password(form_data.password, user.hashed_password):
+    is_valid, new_hash = await verify_password(form_data.password, user.hashed_password)
+    if not is_valid:
         return False
+    # transparently upgrade hashes made with an older cost factor
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 #create user function
-async def create_user(db: Session, user: schemas.UserCreate, background_tasks: BackgroundTasks):
-    user.password = get_password_hash(user.password)
+async def create_user(db: Session, user: schemas.UserCreate):
+    user.password = await get_password_hash(user.password)
     db_user = models.TemporaryUser(
         username=user.username,
         email=user.email,
         hashed_password=user.password,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
     temp_access_token = create_access_token(
         data={"sub": user.username}, expires_delta=timedelta(minutes=auth_config_settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    return await send_verification_email(user.email, temp_access_token, background_tasks)
+    # the temporary user and its verification mail are committed together
+    return await send_verification_email(db, user.email, temp_access_token)
 
 # verify user
 def verify_user(db: Session, token: str):
@@ -102,7 +110,15 @@ def verify_user(db: Session, token: str):
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-async def get_current_user(token: str = Depends(oauth2_scheme),db: Session = Depends(get_db)):
+def access_token_claims(user, session_id: Union[str, None] = None) -> dict:
+    claims = {"sub": user.username}
+    if session_id:
+        claims["sid"] = session_id
+    if auth_config_settings.AUTH_TRUSTED_CLAIMS:
+        claims.update({"email": user.email, "active": user.is_active})
+    return claims
+
+async def get_current_user(token: str = Depends(oauth2_scheme),db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -116,25 +132,47 @@ async def get_current_user(token: str = Depends(oauth2_scheme),db: Session = Dep
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username=token_data.username)
-    if user is None:
+    if is_session_revoked(payload.get("sid")):
         raise credentials_exception
-    return user
-
-async def check_disposable_email(email: EmailStr):
-    url = "https://mailcheck.p.rapidapi.com/"
+    if auth_config_settings.AUTH_TRUSTED_CLAIMS and "active" in payload:
+        # claims were signed by us at login, no lookup needed
+        return schemas.Principal.construct(username=token_data.username, email=payload.get("email"), is_active=payload["active"])
+    principal = principal_cache.get(token_data.username)
+    if principal is None:
+        user = (await db.execute(select(models.User).where(models.User.username == token_data.username))).scalars().first()
+        if user is None:
+            raise credentials_exception
+        principal = schemas.Principal.from_orm(user)
+        principal_cache.set(token_data.username, principal)
+    return principal
 
-    querystring = {"domain":email}
+# session id (sid claim) of an access token we signed, for logout. expiry is not checked:
+# the access token lasts minutes, its session's refresh tokens last days and must still end
+async def get_current_session_id(token: str = Depends(oauth2_scheme)):
+    try:
+        payload = jwt.decode(token, auth_config_settings.SECRET_KEY, algorithms=[auth_config_settings.ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload.get("sid")
 
-    headers = {
-	"X-RapidAPI-Key": auth_config_settings.RAPIDAPI_KEY,
-	"X-RapidAPI-Host": auth_config_settings.RAPIDAPI_HOST
-}
+# username of the caller on public endpoints, None for anonymous or invalid tokens
+async def get_optional_username(token: Union[str, None] = Depends(optional_oauth2_scheme)):
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, auth_config_settings.SECRET_KEY, algorithms=[auth_config_settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
 
-    response = request("GET", url, headers=headers, params=querystring).json()
-    return response["disposable"]
+async def check_disposable_email(email: EmailStr):
+    return await disposable_email_checker.is_disposable(email)
 
-async def sign_up_user(db: Session,user: schemas.UserCreate,background_tasks: BackgroundTasks):
+async def sign_up_user(db: Session,user: schemas.UserCreate):
     is_disposable_email = await check_disposable_email(user.email)
     if is_disposable_email:
         raise HTTPException(status_code=400, detail="Disposable email not allowed")
@@ -156,10 +194,10 @@ async def sign_up_user(db: Session,user: schemas.UserCreate,background_tasks: Ba
     db_user_email = get_user_by_email(db,email=user.email)
     if db_user_email:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return await create_user(db=db,user=user,background_tasks=background_tasks)
+    return await create_user(db=db,user=user)
 
 
-async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: schemas.Principal = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
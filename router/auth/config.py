@@ -9,9 +9,51 @@ class Settings(BaseSettings):
     ALGORITHM:str
     MAIL_PASSWORD:str
     MAIL_USERNAME: str
+    MAIL_SERVER: str = "smtp.gmail.com"
+    MAIL_PORT: int = 587
+    MAIL_STARTTLS: bool = True
+    MAIL_SSL: bool = False
+    MAIL_USE_CREDENTIALS: bool = True
+    MAIL_FROM_NAME: str = "Citizen"
+    MAIL_TIMEOUT_SECONDS: float = 30
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_POLL_INTERVAL_SECONDS: float = 2
+    MAIL_MAX_ATTEMPTS: int = 5
+    MAIL_RETRY_BASE_SECONDS: int = 30
+    MAIL_IDLE_DISCONNECT_SECONDS: int = 60
+    # run the queue worker inside the api process; disable when `python -m database.mail_queue` runs separately
+    MAIL_QUEUE_IN_PROCESS: bool = True
     RAPIDAPI_HOST: str
     RAPIDAPI_KEY: str
     FRONT_END_URL: str
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    DISPOSABLE_EMAIL_API_URL: str = "https://mailcheck.p.rapidapi.com/"
+    DISPOSABLE_EMAIL_TIMEOUT_SECONDS: float = 2.0
+    DISPOSABLE_EMAIL_BLOCKLIST_FILE: str = ""
+    DISPOSABLE_EMAIL_CACHE_SIZE: int = 10000
+    DISPOSABLE_EMAIL_CACHE_TTL_SECONDS: int = 86400
+    DISPOSABLE_EMAIL_BREAKER_THRESHOLD: int = 5
+    DISPOSABLE_EMAIL_BREAKER_RESET_SECONDS: int = 30
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    # embed email and is_active in access tokens and trust them instead of loading the user;
+    # a deactivation then only takes effect when the token expires
+    AUTH_TRUSTED_CLAIMS: bool = False
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    REVOKED_SESSIONS_MAX: int = 100000
+    # token buckets on both login endpoints, checked before any password hashing
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_IP_BURST: int = 30
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: int = 30
+    LOGIN_RATE_LIMIT_USER_BURST: int = 10
+    LOGIN_RATE_LIMIT_USER_PER_MINUTE: int = 5
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # dotted path to a RateLimitBackend subclass; empty keeps the buckets in process
+    RATE_LIMIT_BACKEND: str = ""
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
 
     class Config:
         env_file = ".env"
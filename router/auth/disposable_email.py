@@ -0,0 +1,130 @@
+import logging
+import time
+from typing import Iterable, Union
+
+import httpx
+from is_disposable_email import domain_list
+
+from router.auth.config import Settings, get_settings
+from router.auth.ttl_cache import TTLCache
+
+auth_config_settings:Settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def load_blocklist(path: str = "") -> frozenset:
+    # bundled list from is-disposable-email, optionally extended by a file with one domain per line
+    domains = set(domain_list)
+    if path:
+        with open(path) as blocklist_file:
+            for line in blocklist_file:
+                line = line.split("#", 1)[0].strip().lower()
+                if line:
+                    domains.add(line)
+    return frozenset(domains)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        # half-open: let a single probe through once the cool-down has passed
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class DisposableEmailChecker:
+    def __init__(
+        self,
+        api_url: str,
+        headers: dict,
+        timeout: float,
+        blocklist: Iterable[str],
+        cache: TTLCache,
+        breaker: CircuitBreaker,
+    ):
+        self.api_url = api_url
+        self.headers = headers
+        self.timeout = timeout
+        self.blocklist = frozenset(blocklist)
+        self.cache = cache
+        self.breaker = breaker
+        self._client: Union[httpx.AsyncClient, None] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def _remote_verdict(self, domain: str) -> Union[bool, None]:
+        if not self.breaker.allow():
+            return None
+        try:
+            response = await self._get_client().get(self.api_url, params={"domain": domain})
+            response.raise_for_status()
+            verdict = bool(response.json()["disposable"])
+        except (httpx.HTTPError, ValueError, KeyError) as exc:
+            logger.warning("disposable email lookup failed for %s: %r", domain, exc)
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        return verdict
+
+    async def is_disposable(self, email: str) -> bool:
+        domain = email.rsplit("@", 1)[-1].strip().lower()
+        if domain in self.blocklist:
+            return True
+        verdict = self.cache.get(domain)
+        if verdict is not None:
+            return verdict
+        verdict = await self._remote_verdict(domain)
+        if verdict is None:
+            # the offline list already passed, so an unreachable api does not block signups
+            return False
+        self.cache.set(domain, verdict)
+        return verdict
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+disposable_email_checker = DisposableEmailChecker(
+    api_url=auth_config_settings.DISPOSABLE_EMAIL_API_URL,
+    headers={
+        "X-RapidAPI-Key": auth_config_settings.RAPIDAPI_KEY,
+        "X-RapidAPI-Host": auth_config_settings.RAPIDAPI_HOST,
+    },
+    timeout=auth_config_settings.DISPOSABLE_EMAIL_TIMEOUT_SECONDS,
+    blocklist=load_blocklist(auth_config_settings.DISPOSABLE_EMAIL_BLOCKLIST_FILE),
+    cache=TTLCache(
+        maxsize=auth_config_settings.DISPOSABLE_EMAIL_CACHE_SIZE,
+        ttl=auth_config_settings.DISPOSABLE_EMAIL_CACHE_TTL_SECONDS,
+    ),
+    breaker=CircuitBreaker(
+        failure_threshold=auth_config_settings.DISPOSABLE_EMAIL_BREAKER_THRESHOLD,
+        reset_seconds=auth_config_settings.DISPOSABLE_EMAIL_BREAKER_RESET_SECONDS,
+    ),
+)
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Union
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from router.auth.config import Settings, get_settings
+
+auth_config_settings:Settings = get_settings()
+
+
+class PasswordHasher:
+    # runs bcrypt on a bounded thread pool so hashing never blocks the event loop;
+    # bcrypt releases the GIL, so the pool size is the real concurrency limit
+    def __init__(self, rounds: int, max_workers: int, max_pending: int):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _tracked(self, func, *args):
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    async def _submit(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login attempts in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._tracked, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def _needs_rehash(self, hashed_password: str) -> bool:
+        if self.context.needs_update(hashed_password):
+            return True
+        return self.context.handler().from_string(hashed_password).rounds != self.rounds
+
+    def _verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Union[str, None]]:
+        if not self.context.verify(plain_password, hashed_password):
+            return False, None
+        if self._needs_rehash(hashed_password):
+            return True, self.context.hash(plain_password)
+        return True, None
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    # returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost factor
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Union[str, None]]:
+        return await self._submit(self._verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "running": self.running,
+            "queued": max(self.pending - self.running, 0),
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=auth_config_settings.BCRYPT_ROUNDS,
+    max_workers=auth_config_settings.PASSWORD_HASH_WORKERS,
+    max_pending=auth_config_settings.PASSWORD_HASH_MAX_PENDING,
+)
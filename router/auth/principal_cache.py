@@ -0,0 +1,38 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.models import User, UserProfile
+from router.auth.config import Settings, get_settings
+from router.auth.ttl_cache import TTLCache
+
+auth_config_settings: Settings = get_settings()
+
+# authenticated principals by username, so a valid token does not cost a users lookup per request
+principal_cache = TTLCache(
+    maxsize=auth_config_settings.PRINCIPAL_CACHE_SIZE,
+    ttl=auth_config_settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username)
+
+
+# drop a cached principal once a session commits a change to that user or their profile;
+# bulk update() statements bypass this and are covered by the ttl
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, (User, UserProfile)):
+            session.info.setdefault("principals_stale", set()).add(obj.username)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for username in session.info.pop("principals_stale", ()):
+        invalidate_principal(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_after_rollback(session):
+    session.info.pop("principals_stale", None)
@@ -0,0 +1,91 @@
+import importlib
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from router.auth.config import Settings, get_settings
+
+auth_config_settings: Settings = get_settings()
+
+
+class RateLimitBackend(ABC):
+    # token bucket store. take() spends one token from the bucket at key and returns 0 when
+    # allowed, otherwise the seconds until the next token; shared backends subclass this
+    @abstractmethod
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        ...
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    # per-process buckets, split over shards so concurrent logins rarely share a lock.
+    # each shard is an lru bounded to max_keys / shards, idle buckets are the first to go
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated_at = buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / refill_per_second
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._max_keys_per_shard:
+                buckets.popitem(last=False)
+        return retry_after
+
+
+def load_backend(settings: Settings) -> RateLimitBackend:
+    if not settings.RATE_LIMIT_BACKEND:
+        return MemoryRateLimitBackend(settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_MAX_KEYS)
+    # dotted path to a RateLimitBackend subclass, for limits shared between workers
+    module_name, _, class_name = settings.RATE_LIMIT_BACKEND.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class LoginRateLimiter:
+    def __init__(self, backend: RateLimitBackend, settings: Settings):
+        self.backend = backend
+        self.settings = settings
+
+    def client_ip(self, request: Request) -> str:
+        if self.settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+            forwarded_for = request.headers.get("x-forwarded-for")
+            if forwarded_for:
+                return forwarded_for.split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    async def check(self, scope: str, ip: str, username: str):
+        settings = self.settings
+        checks = (
+            ("{}:ip:{}".format(scope, ip), settings.LOGIN_RATE_LIMIT_IP_BURST, settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE),
+            ("{}:user:{}".format(scope, username.lower()), settings.LOGIN_RATE_LIMIT_USER_BURST, settings.LOGIN_RATE_LIMIT_USER_PER_MINUTE),
+        )
+        for key, capacity, per_minute in checks:
+            retry_after = await self.backend.take(key, capacity, per_minute / 60)
+            if retry_after:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, try again later",
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+    def dependency(self, scope: str):
+        # runs before the route body, so throttled attempts never reach bcrypt or totp
+        async def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+            if self.settings.LOGIN_RATE_LIMIT_ENABLED:
+                await self.check(scope, self.client_ip(request), form_data.username)
+        return limit_login
+
+
+login_rate_limiter = LoginRateLimiter(load_backend(auth_config_settings), auth_config_settings)
@@ -0,0 +1,96 @@
+import datetime
+import hashlib
+import secrets
+from typing import Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.models import RefreshToken
+from router.auth.config import Settings, get_settings
+from router.auth.ttl_cache import TTLCache
+
+auth_config_settings: Settings = get_settings()
+
+CITIZEN = "citizen"
+AUTHORITY = "authority"
+
+# sids of logged out or compromised sessions. access tokens of a revoked session are refused
+# until they expire on their own, so entries never need to outlive an access token
+revoked_sessions = TTLCache(
+    maxsize=auth_config_settings.REVOKED_SESSIONS_MAX,
+    ttl=auth_config_settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+
+def is_session_revoked(session_id) -> bool:
+    return session_id is not None and session_id in revoked_sessions
+
+
+def _hash_token(token: str) -> str:
+    # refresh tokens are 256 random bits, a fast hash is enough to keep them out of the table
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _invalid_refresh_token():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _add_token(db: Session, subject: str, audience: str, family_id: str) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=_hash_token(token),
+        family_id=family_id,
+        subject=subject,
+        audience=audience,
+        expires_at=datetime.datetime.now() + datetime.timedelta(days=auth_config_settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def issue_refresh_token(db: AsyncSession, subject: str, audience: str) -> Tuple[str, str]:
+    # starts a new session family at login, returns (refresh_token, session_id). logins run on
+    # the event loop, so the insert goes through the async session like the rest of the login
+    family_id = secrets.token_hex(16)
+    token = _add_token(db, subject, audience, family_id)
+    await db.commit()
+    return token, family_id
+
+
+def rotate_refresh_token(db: Session, token: str, audience: str) -> Tuple[str, str, str]:
+    # spends a refresh token and returns (subject, session_id, next_refresh_token)
+    now = datetime.datetime.now()
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _hash_token(token), RefreshToken.audience == audience).first()
+    if row is None or row.expires_at <= now:
+        raise _invalid_refresh_token()
+    # conditional update so two concurrent refreshes cannot both spend the same token
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.id == row.id, RefreshToken.used_at.is_(None), RefreshToken.revoked_at.is_(None)
+    ).update({"used_at": now}, synchronize_session=False)
+    if not claimed:
+        # a spent or revoked token came back, assume it leaked and end the whole session
+        db.rollback()
+        revoke_session(db, row.family_id)
+        raise _invalid_refresh_token()
+    next_token = _add_token(db, row.subject, audience, row.family_id)
+    db.commit()
+    return row.subject, row.family_id, next_token
+
+
+def revoke_session(db: Session, session_id: str):
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == session_id, RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": datetime.datetime.now()}, synchronize_session=False)
+    db.commit()
+    revoked_sessions.set(session_id, True)
+
+
+def prune_refresh_tokens(db: Session) -> int:
+    deleted = db.query(RefreshToken).filter(RefreshToken.expires_at <= datetime.datetime.now()).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,122 @@
+import datetime
+import re
+import zlib
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.config import db_settings
+from database.models import Complaint, ComplaintSignature
+from router.complaints.complaint_nearby import location_filter
+from router.complaints.vote_buffer import vote_buffer
+from router.geohash import haversine_m
+
+# minhash over character shingles: the share of equal slots between two signatures
+# estimates the jaccard similarity of their shingle sets
+SHINGLE_SIZE = 4
+NUM_PERMUTATIONS = 64
+MERSENNE_PRIME = (1 << 31) - 1
+# RandomState streams are frozen, so stored signatures stay comparable across numpy releases
+_permutations = np.random.RandomState(20221001)
+PERMUTATION_A = _permutations.randint(1, MERSENNE_PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+PERMUTATION_B = _permutations.randint(0, MERSENNE_PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(title: str, description: str) -> set:
+    text = " ".join(WORD.findall("{} {}".format(title, description).lower()))
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[start:start + SHINGLE_SIZE] for start in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(title: str, description: str) -> np.ndarray:
+    # crc32 rather than hash(), which is salted per process
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles(title, description)), dtype=np.uint64)
+    hashes %= MERSENNE_PRIME
+    permuted = (PERMUTATION_A[:, None] * hashes[None, :] + PERMUTATION_B[:, None]) % MERSENNE_PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def pack_signature(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def unpack_signature(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4")
+
+
+async def find_duplicate_complaints(db: AsyncSession, complaint, signature: np.ndarray):
+    # pending complaints of the same ward and type near the new one and recent enough, scored
+    # against its signature. the radius is resolved first on the geohash index alone, which
+    # keeps the candidates to a handful of rows whatever the table size, so their signatures
+    # are compared exhaustively instead of through lsh buckets
+    radius_m = db_settings.DUPLICATE_RADIUS_M
+    nearby = (await db.execute(
+        select(Complaint.id, Complaint.latitude, Complaint.longitude).where(*location_filter(complaint.latitude, complaint.longitude, radius_m))
+    )).all()
+    if not nearby:
+        return []
+    distances = haversine_m(
+        complaint.latitude, complaint.longitude,
+        np.array([row.latitude for row in nearby], dtype=np.float64),
+        np.array([row.longitude for row in nearby], dtype=np.float64),
+    )
+    distance_by_id = {row.id: float(distance) for row, distance in zip(nearby, distances) if distance <= radius_m}
+    if not distance_by_id:
+        return []
+
+    # ward, type, status and age are checked on the fetched rows: given only the ids, every
+    # planner takes the primary key, while with these filters sqlite would rather walk the
+    # ward feed index over the whole window
+    since = datetime.datetime.now() - datetime.timedelta(days=db_settings.DUPLICATE_WINDOW_DAYS)
+    rows = [
+        row for row in (await db.execute(select(
+            Complaint.id, Complaint.complaint_title, Complaint.complaint_desc, Complaint.ward_id, Complaint.complaint_type,
+            Complaint.completed_status, Complaint.like_count, Complaint.created_at, ComplaintSignature.signature,
+        ).outerjoin(ComplaintSignature, ComplaintSignature.complaint_id == Complaint.id).where(Complaint.id.in_(distance_by_id)))).all()
+        if row.ward_id == complaint.ward_id and row.complaint_type == complaint.complaint_type
+        and row.completed_status == "PENDING" and row.created_at >= since
+    ]
+    if not rows:
+        return []
+    # complaints from before the signatures table are signed on the fly
+    signatures = np.stack([
+        unpack_signature(row.signature) if row.signature is not None else minhash(row.complaint_title, row.complaint_desc)
+        for row in rows
+    ])
+    similarities = (signatures == signature).mean(axis=1)
+    duplicates = [
+        {
+            "id": row.id,
+            "complaint_title": row.complaint_title,
+            "like_count": row.like_count + (vote_buffer.pending(row.id) if vote_buffer.enabled else 0),
+            "created_at": row.created_at,
+            "distance": distance_by_id[row.id],
+            "similarity": float(similarity),
+        }
+        for row, similarity in zip(rows, similarities)
+        if similarity >= db_settings.DUPLICATE_MIN_SIMILARITY
+    ]
+    duplicates.sort(key=lambda duplicate: (-duplicate["similarity"], duplicate["distance"]))
+    return duplicates[:db_settings.DUPLICATE_MAX_RESULTS]
+
+
+def backfill_signatures(db: Session, batch_size: int = 1000) -> int:
+    signed = 0
+    last_id = 0
+    while True:
+        rows = db.query(Complaint.id, Complaint.complaint_title, Complaint.complaint_desc).outerjoin(
+            ComplaintSignature, ComplaintSignature.complaint_id == Complaint.id
+        ).filter(ComplaintSignature.complaint_id.is_(None), Complaint.id > last_id).order_by(Complaint.id).limit(batch_size).all()
+        if not rows:
+            return signed
+        db.add_all(
+            ComplaintSignature(complaint_id=row.id, signature=pack_signature(minhash(row.complaint_title, row.complaint_desc)))
+            for row in rows
+        )
+        db.commit()
+        signed += len(rows)
+        last_id = rows[-1].id
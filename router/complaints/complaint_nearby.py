@@ -0,0 +1,65 @@
+from typing import Union
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database.models import Complaint, ComplaintType, UserProfile
+from router.complaints.vote_buffer import vote_buffer
+from router.geohash import (bounding_box, covering_cells, haversine_m,
+                            prefix_range)
+
+NEARBY_MAX_RADIUS_M = 50000
+
+
+def location_filter(latitude: float, longitude: float, radius_m: float) -> list:
+    # geohash ranges narrow the index scan to the cells under the circle's bounding box, and
+    # the box itself trims the cell edges inside the same index
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_m)
+    clauses = [Complaint.latitude.between(min_lat, max_lat), Complaint.longitude.between(min_lon, max_lon)]
+    ranges = []
+    for cell in covering_cells(min_lat, max_lat, min_lon, max_lon):
+        start, end = prefix_range(cell)
+        ranges.append(and_(Complaint.geohash >= start, Complaint.geohash < end) if end else Complaint.geohash >= start)
+    if ranges:
+        clauses.append(or_(*ranges))
+    return clauses
+
+
+async def nearby_complaints(db: AsyncSession, latitude: float, longitude: float, radius_m: float, complaint_type: Union[int, None] = None,
+                            status: Union[str, None] = None, limit: int = 30):
+    # only (id, lat, lon) of the candidates are loaded for the exact distance check
+    candidates = select(Complaint.id, Complaint.latitude, Complaint.longitude).where(*location_filter(latitude, longitude, radius_m))
+    if complaint_type:
+        candidates = candidates.where(Complaint.complaint_type == complaint_type)
+    if status:
+        candidates = candidates.where(Complaint.completed_status == status)
+    rows = (await db.execute(candidates)).all()
+    if not rows:
+        return []
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    coordinates = np.array([(row[1], row[2]) for row in rows], dtype=np.float64)
+    distances = haversine_m(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+    inside = np.flatnonzero(distances <= radius_m)
+    # nearest first, ties broken by newest id
+    order = inside[np.lexsort((-ids[inside], distances[inside]))][:limit]
+    if not len(order):
+        return []
+    distance_by_id = dict(zip(ids[order].tolist(), distances[order].tolist()))
+
+    complaints = (await db.execute(select(Complaint, ComplaintType, UserProfile).where(
+        Complaint.id.in_(distance_by_id), Complaint.complaint_type == ComplaintType.id, UserProfile.username == Complaint.username
+    ))).all()
+    results = []
+    for complaint, complaint_type_row, user_profile in complaints:
+        if vote_buffer.enabled:
+            set_committed_value(complaint, "like_count", complaint.like_count + vote_buffer.pending(complaint.id))
+        results.append({
+            "Complaint": complaint,
+            "ComplaintType": complaint_type_row,
+            "UserProfile": user_profile,
+            "distance": distance_by_id[complaint.id],
+        })
+    results.sort(key=lambda result: (result["distance"], -result["Complaint"].id))
+    return results
@@ -0,0 +1,76 @@
+import re
+from typing import Union
+
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.models import (COMPLAINT_SEARCH_DDL, Complaint, ComplaintType,
+                             UserProfile, Ward)
+
+complaints_fts = table("complaints_fts", column("rowid"))
+SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+# title matches weigh more than description matches
+BM25_WEIGHTS = (10.0, 1.0)
+
+
+def fts5_query(q: str) -> str:
+    # every word must match; quoting keeps user input out of the fts5 query syntax, and the
+    # last word is a prefix so partially typed searches still find something
+    terms = SEARCH_TERM.findall(q)
+    if not terms:
+        return ""
+    quoted = ['"{}"'.format(term) for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _dialect(db) -> str:
+    return db.get_bind().dialect.name
+
+
+async def index_complaint(db: AsyncSession, complaint: Complaint):
+    # postgres keeps its generated tsvector column current by itself
+    if _dialect(db) == "sqlite":
+        await db.execute(
+            text("INSERT INTO complaints_fts(rowid, complaint_title, complaint_desc) VALUES (:id, :title, :desc)"),
+            {"id": complaint.id, "title": complaint.complaint_title, "desc": complaint.complaint_desc},
+        )
+
+
+async def search_complaints(db: AsyncSession, q: str, ward_slug: Union[str, None] = None, complaint_type: Union[int, None] = None,
+                            status: Union[str, None] = None, skip: int = 0, limit: int = 30):
+    if _dialect(db) == "postgresql":
+        query_vector = func.websearch_to_tsquery("english", q)
+        search_vector = literal_column("complaints.search_vector")
+        rank = func.ts_rank_cd(search_vector, query_vector)
+        query = select(Complaint, ComplaintType, UserProfile, rank.label("rank")).select_from(Complaint).where(search_vector.op("@@")(query_vector))
+        order = rank.desc()
+    else:
+        match = fts5_query(q)
+        if not match:
+            return []
+        # bm25() is lower for better matches
+        rank = func.bm25(literal_column("complaints_fts"), *BM25_WEIGHTS)
+        query = select(Complaint, ComplaintType, UserProfile, (-rank).label("rank")).select_from(Complaint).join(
+            complaints_fts, complaints_fts.c.rowid == Complaint.id
+        ).where(literal_column("complaints_fts").op("MATCH")(match))
+        order = rank
+    query = query.where(Complaint.complaint_type == ComplaintType.id, UserProfile.username == Complaint.username)
+    if ward_slug:
+        query = query.join(Ward, Ward.ward_id == Complaint.ward_id).where(Ward.ward_slug == ward_slug)
+    if complaint_type:
+        query = query.where(Complaint.complaint_type == complaint_type)
+    if status:
+        query = query.where(Complaint.completed_status == status)
+    return (await db.execute(query.order_by(order, Complaint.id.desc()).offset(skip).limit(limit))).all()
+
+
+def rebuild_search_index(db: Session) -> int:
+    dialect = _dialect(db)
+    for statement in COMPLAINT_SEARCH_DDL.get(dialect, ()):
+        db.execute(text(statement))
+    if dialect == "sqlite":
+        db.execute(text("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')"))
+    db.commit()
+    return db.query(func.count(Complaint.id)).scalar()
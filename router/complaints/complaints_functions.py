@@ -1,167 +1,355 @@
-from database.crud import get_ward
-from database.models import (Comment, Complaint, ComplaintStatus,
-                             ComplaintSubType, ComplaintType, ComplaintUpdate,
-                             UserProfile, Votes, Ward, WardServantProfile)
+
+import asyncio
+import datetime
+import random
+from typing import List, Union
+
+import orjson
+from database.config import db_settings
+from database.crud import upsert_insert
+from database.models import (Comment, Complaint, ComplaintSignature,
+                             ComplaintStatus, ComplaintSubType, ComplaintType,
+                             ComplaintUpdate, UserProfile, Votes, Ward,
+                             WardServantProfile)
 from database.schemas import (CommentCreate, ComplaintCreate, UpdatedComplaint,
                               UserBase)
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from router.complaints.complaint_duplicates import (find_duplicate_complaints,
+                                                    minhash, pack_signature)
+from router.complaints.complaint_search import index_complaint
+from router.complaints.vote_buffer import vote_buffer
+from router.geohash import encode as encode_geohash
+from router.pagination import decode_cursor, encode_cursor
+from router.ward.ward_rollups import (record_complaint, record_completion,
+                                      vote_rollup_statement)
+from sqlalchemy import and_, delete, func, literal, or_, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
 
+def _merge_buffered_votes(complaint: Complaint):
+    set_committed_value(complaint, "like_count", complaint.like_count + vote_buffer.pending(complaint.id))
 
-def get_complaints(db: Session, skip: int = 0, limit: int = 30, ward_slug: str='',recent: bool = False,resolved: bool = False):#-> List[ComplaintBase]:
-    ward = db.query(Ward).filter(Ward.ward_slug == ward_slug).first()
+# columns of the feed card, in the order ComplaintSchema serializes them
+FEED_COMPLAINT_COLUMNS = (
+    Complaint.complaint_title, Complaint.complaint_desc, Complaint.photo_url, Complaint.complaint_type,
+    Complaint.complaint_sub_type, Complaint.ward_id, Complaint.id, Complaint.like_count, Complaint.dislike_count,
+    Complaint.no_of_comments, Complaint.username, Complaint.completed_status, Complaint.created_at,
+)
+
+async def _feed_query(db: AsyncSession, entities, skip: int, limit: int, ward_slug: str, recent: bool, resolved: bool, cursor: Union[str, None], my_vote_username: Union[str, None]):
+    ward = (await db.execute(select(Ward).where(Ward.ward_slug == ward_slug))).scalars().first()
     if not ward:
         raise HTTPException(status_code=404, detail="Complaints Not found")
-    if recent:
-        complaints = db.query(Complaint, ComplaintType, UserProfile).filter(Complaint.ward_id==ward.ward_id, Complaint.complaint_type==ComplaintType.id, UserProfile.username==Complaint.username, Complaint.completed_status=="PENDING").order_by(Complaint.created_at.desc()).offset(skip).limit(limit).all()
-    elif resolved:
-        complaints = db.query(Complaint, ComplaintType, UserProfile).filter(Complaint.ward_id == ward.ward_id, Complaint.complaint_type==ComplaintType.id, UserProfile.username==Complaint.username, Complaint.completed_status=="COMPLETED").offset(skip).limit(limit).all()
-    else: 
-        complaints = db.query(Complaint, ComplaintType, UserProfile).filter(Complaint.ward_id == ward.ward_id, Complaint.complaint_type==ComplaintType.id, UserProfile.username==Complaint.username, Complaint.completed_status=="PENDING").order_by(Complaint.like_count.desc()).offset(skip).limit(limit).all()
-    return complaints
-
-def get_complaint(db:Session, ward_slug:str = '', complaint_id:int = 0 ):
-    ward = db.query(Ward).filter(Ward.ward_slug == ward_slug).first()
+    status = "COMPLETED" if resolved else "PENDING"
+    # the popular feed is ordered by votes, the recent and resolved feeds by creation time
+    sort_column = Complaint.created_at if (recent or resolved) else Complaint.like_count
+    feed = "resolved" if resolved else "recent" if recent else "popular"
+    query = select(*entities).where(Complaint.ward_id == ward.ward_id, Complaint.complaint_type==ComplaintType.id, UserProfile.username==Complaint.username, Complaint.completed_status==status)
+    if my_vote_username:
+        # the caller's vote on each card comes from a primary-key outer join, not a request per card
+        query = query.add_columns(Votes.vote.label("my_vote")).outerjoin(
+            Votes, and_(Votes.complaint_id == Complaint.id, Votes.username == my_vote_username)
+        )
+    if cursor:
+        # keyset seek on (ward_id, completed_status, sort_column, id) instead of scanning skipped rows
+        sort_key, last_id = decode_cursor(cursor, feed, datetime.datetime if (recent or resolved) else int)
+        query = query.where(or_(sort_column < sort_key, and_(sort_column == sort_key, Complaint.id < last_id)))
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(sort_column.desc(), Complaint.id.desc()).limit(limit), sort_column, feed
+
+# the ward feed: selects plain columns and encodes the ComplaintListResponse shape
+# straight to json without orm entities or pydantic models
+async def get_complaints_json(db: AsyncSession, skip: int = 0, limit: int = 30, ward_slug: str='',recent: bool = False,resolved: bool = False, cursor: Union[str, None] = None, my_vote_username: Union[str, None] = None):
+    entities = (*FEED_COMPLAINT_COLUMNS, ComplaintType.type_name, UserProfile.profile_picture)
+    query, sort_column, feed = await _feed_query(db, entities, skip, limit, ward_slug, recent, resolved, cursor, my_vote_username)
+    rows = (await db.execute(query)).all()
+    keys = [column.key for column in FEED_COMPLAINT_COLUMNS]
+    width = len(keys)
+    like_index = keys.index("like_count")
+    items = []
+    for row in rows:
+        complaint = dict(zip(keys, row))
+        if vote_buffer.enabled:
+            complaint["like_count"] = row[like_index] + vote_buffer.pending(complaint["id"])
+        items.append({
+            "Complaint": complaint,
+            "ComplaintType": {"type_name": row[width]},
+            "UserProfile": {"profile_picture": row[width + 1]},
+            "my_vote": row[width + 2] if my_vote_username else None,
+        })
+    next_cursor = None
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(feed, last[keys.index(sort_column.key)], last.id)
+    return orjson.dumps(items), next_cursor
+
+async def get_complaint(db:AsyncSession, ward_slug:str = '', complaint_id:int = 0 ):
+    ward = (await db.execute(select(Ward).where(Ward.ward_slug == ward_slug))).scalars().first()
     if not ward:
         raise HTTPException(status_code=404, detail="Complaint Not found")
-    complaint = db.query(Complaint, ComplaintType, ComplaintSubType, UserProfile).filter(Complaint.id==complaint_id, Complaint.complaint_type==ComplaintType.id, Complaint.complaint_sub_type==ComplaintSubType.id, UserProfile.username==Complaint.username).first()
+    complaint = (await db.execute(select(Complaint, ComplaintType, ComplaintSubType, UserProfile).where(Complaint.id==complaint_id, Complaint.complaint_type==ComplaintType.id, Complaint.complaint_sub_type==ComplaintSubType.id, UserProfile.username==Complaint.username))).first()
+    if not complaint:
+        raise HTTPException(status_code=404, detail="Complaint Not found")
+    if vote_buffer.enabled:
+        _merge_buffered_votes(complaint.Complaint)
     complaint.Complaint.ward_slug = ward_slug
     return complaint
 
-async def reform_complaint(db: Session, complaint: UpdatedComplaint, current_user: UserBase, complaint_id: int):
-    db_complaint = db.query(Complaint).filter(Complaint.id == complaint_id).first()
+async def reform_complaint(db: AsyncSession, complaint: UpdatedComplaint, current_user: UserBase, complaint_id: int):
+    # locked, so no vote lands between moving the complaint's rollups and its ward or type
+    db_complaint = (await db.execute(select(Complaint).where(Complaint.id == complaint_id).with_for_update())).scalars().first()
     if not db_complaint:
         raise HTTPException(status_code=404, detail="Complaint Not found")
     if db_complaint.username != current_user.username:
         raise HTTPException(status_code=401, detail="Not Authorized")
     try:
+        moved = (db_complaint.ward_id, db_complaint.complaint_type) != (complaint.ward_id, complaint.complaint_type)
+        if moved:
+            await record_complaint(db, db_complaint, sign=-1)
         db_complaint.complaint_type = complaint.complaint_type
         db_complaint.complaint_sub_type = complaint.complaint_sub_type
         db_complaint.ward_id = complaint.ward_id
         db_complaint.latitude = complaint.latitude
         db_complaint.longitude = complaint.longitude
+        db_complaint.geohash = encode_geohash(complaint.latitude, complaint.longitude)
+        if moved:
+            await record_complaint(db, db_complaint)
 
-        ward_servant = db.query(WardServantProfile).filter(WardServantProfile.ward_id == complaint.ward_id, WardServantProfile.position == "NAGARSEVAK").first() 
+        ward_servant = (await db.execute(select(WardServantProfile).where(WardServantProfile.ward_id == complaint.ward_id, WardServantProfile.position == "NAGARSEVAK"))).scalars().first()
         if not ward_servant:
             raise HTTPException(status_code=404, detail="No ward servant found")
-        db_complaint_status = db.query(ComplaintStatus).filter(ComplaintStatus.complaint_id == complaint_id).first()
+        db_complaint_status = (await db.execute(select(ComplaintStatus).where(ComplaintStatus.complaint_id == complaint_id))).scalars().first()
         db_complaint_status.ward_servant_username = ward_servant.username
-        db.commit()
+        await db.commit()
         return JSONResponse(status_code=200, content={"message": "Complaint updated"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str("Internal server error"))
 
-async def reform_complaint_status(db: Session, complaint_id: int, current_user: UserBase):
-    db_complaint = db.query(Complaint).filter(Complaint.id == complaint_id, Complaint.username == current_user.username).first()
+async def reform_complaint_status(db: AsyncSession, complaint_id: int, current_user: UserBase):
+    db_complaint = (await db.execute(select(Complaint).where(Complaint.id == complaint_id, Complaint.username == current_user.username))).scalars().first()
     if not db_complaint:
         raise HTTPException(status_code=404, detail="Complaint Not found")
     if(db_complaint.completed_status == "COMPLETED"):
         raise HTTPException(status_code=400, detail="Complaint already resolved")
     try:
         db_complaint.completed_status = "COMPLETED"
-        db.commit()
+        db_complaint.completed_at = datetime.datetime.now()
+        await record_completion(db, db_complaint)
+        # the councillor work queue filters on the assignment's copy of the status
+        await db.execute(update(ComplaintStatus).where(ComplaintStatus.complaint_id == complaint_id).values(completed_status="COMPLETED"))
+        await db.execute(update(UserProfile).where(UserProfile.username == db_complaint.username).values(
+            pending_complaints_count=UserProfile.pending_complaints_count - 1,
+            completed_complaints_count=UserProfile.completed_complaints_count + 1,
+        ))
+        await db.commit()
         return JSONResponse(status_code=200, content={"message": "Complaint Resolved"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str("Internal server error"))
 
-async def create_complaint(db: Session, complaint: ComplaintCreate, current_user: UserBase):
-    ward_servant = db.query(WardServantProfile).filter(WardServantProfile.ward_id == complaint.ward_id, WardServantProfile.position == "NAGARSEVAK").first() #Hard coded for now
+async def create_complaint(db: AsyncSession, complaint: ComplaintCreate, current_user: UserBase, allow_duplicate: bool = False):
+    ward_servant = (await db.execute(select(WardServantProfile).where(WardServantProfile.ward_id == complaint.ward_id, WardServantProfile.position == "NAGARSEVAK"))).scalars().first() #Hard coded for now
     if not ward_servant:
         raise HTTPException(status_code=404, detail="No ward servant found")
+    signature = minhash(complaint.complaint_title, complaint.complaint_desc)
+    if db_settings.DUPLICATE_CHECK_ENABLED and not allow_duplicate:
+        duplicates = await find_duplicate_complaints(db, complaint, signature)
+        if duplicates:
+            # the client can upvote one of these, or resubmit with allow_duplicate
+            raise HTTPException(status_code=409, detail=jsonable_encoder({"message": "Similar complaints already reported", "duplicates": duplicates}))
     try:
-        db_complaint = Complaint( **complaint.dict(), username=current_user.username)
+        db_complaint = Complaint( **complaint.dict(), geohash=encode_geohash(complaint.latitude, complaint.longitude), username=current_user.username)
         db.add(db_complaint)
-        db.commit()
-        db.refresh(db_complaint)
+        await db.flush()
+        await index_complaint(db, db_complaint)
+        await record_complaint(db, db_complaint)
+        db.add(ComplaintSignature(complaint_id=db_complaint.id, signature=pack_signature(signature)))
         db_complaint_status = ComplaintStatus(
             complaint_id=db_complaint.id,
             ward_servant_username=ward_servant.username,
             completed_status="PENDING",
         )
         db.add(db_complaint_status)
-        db.commit()
-        db.refresh(db_complaint_status)
-        db_complaint.ward_slug = get_ward(db, complaint.ward_id).ward_slug
+        await db.execute(update(UserProfile).where(UserProfile.username == current_user.username).values(
+            pending_complaints_count=UserProfile.pending_complaints_count + 1,
+        ))
+        await db.commit()
+        db_complaint.ward_slug = (await db.execute(select(Ward.ward_slug).where(Ward.ward_id == complaint.ward_id))).scalar()
         return db_complaint
     except Exception as e:
         raise HTTPException(status_code=500, detail=str("Internal server error"))
 
-def get_comments(db: Session, complaint_id: int,parent_comment_id):
-    comments = db.query(Comment).filter(Comment.complaint_id == complaint_id,  Comment.parent_comment_id==parent_comment_id).all()
+async def get_comments(db: AsyncSession, complaint_id: int,parent_comment_id, depth: int = 1, limit_per_level: Union[int, None] = None):
+    # walk the thread below parent_comment_id with one recursive cte, then nest it in memory
+    tree = select(Comment.id, Comment.parent_comment_id, Comment.created_at, literal(1).label("depth")).where(
+        Comment.complaint_id == complaint_id, Comment.parent_comment_id == parent_comment_id
+    ).cte("comment_tree", recursive=True)
+    tree = tree.union_all(
+        select(Comment.id, Comment.parent_comment_id, Comment.created_at, tree.c.depth + 1)
+        .join(tree, Comment.parent_comment_id == tree.c.id)
+        .where(tree.c.depth < depth)
+    )
+    ranked = select(
+        tree.c.id,
+        tree.c.depth,
+        func.row_number().over(partition_by=tree.c.parent_comment_id, order_by=(tree.c.created_at, tree.c.id)).label("position"),
+    ).subquery()
+    replies = aliased(Comment)
+    reply_count = select(func.count()).where(replies.parent_comment_id == Comment.id).scalar_subquery()
+    query = select(Comment, ranked.c.depth, reply_count.label("reply_count")).join(ranked, Comment.id == ranked.c.id)
+    if limit_per_level:
+        query = query.where(ranked.c.position <= limit_per_level)
+    rows = (await db.execute(query.order_by(ranked.c.depth, Comment.created_at, Comment.id))).all()
+
+    nodes = {}
+    comments = []
+    for comment, comment_depth, comment_reply_count in rows:
+        node = {
+            "id": comment.id,
+            "comment_text": comment.comment_text,
+            "parent_comment_id": comment.parent_comment_id,
+            "username": comment.username,
+            "complaint_id": comment.complaint_id,
+            "created_at": comment.created_at,
+            "reply_count": comment_reply_count,
+            "replies": [],
+        }
+        if comment_depth == 1:
+            comments.append(node)
+        elif comment.parent_comment_id in nodes:
+            nodes[comment.parent_comment_id]["replies"].append(node)
+        else:
+            # parent was cut by limit_per_level
+            continue
+        nodes[comment.id] = node
     return comments
 
-def create_comment(db: Session, complaint_id: int, comment: CommentCreate, current_user: UserBase):
+async def create_comment(db: AsyncSession, complaint_id: int, comment: CommentCreate, current_user: UserBase):
     try:
         db_comment = Comment( 
             comment_text=comment.comment_text, 
             parent_comment_id=comment.parent_comment_id,
             complaint_id=complaint_id, 
             username=current_user.username)
-        db.query(Complaint).filter(Complaint.id == complaint_id).update({Complaint.no_of_comments: Complaint.no_of_comments + 1})
+        await db.execute(update(Complaint).where(Complaint.id == complaint_id).values(no_of_comments=Complaint.no_of_comments + 1))
         db.add(db_comment)
-        db.commit()
-        db.refresh(db_comment)
+        await db.commit()
+        await db.refresh(db_comment)
         return db_comment
     except Exception as e:
         raise HTTPException(status_code=500, detail=str("Internal server error"))
 
-def get_vote_count(db: Session, complaint_id: int):
-    complaint = db.query(Complaint).filter(Complaint.id == complaint_id).first()
-    if not complaint:
+async def get_vote_count(db: AsyncSession, complaint_id: int):
+    like_count = (await db.execute(select(Complaint.like_count).where(Complaint.id == complaint_id))).first()
+    if not like_count:
         raise HTTPException(status_code=404, detail="Complaint Not found")
-    return complaint.like_count
-
-def create_post_vote(db:Session, complaint_id:int, vote:int, current_user: UserBase ):
-    user_vote = db.query(Votes).filter(Votes.complaint_id == complaint_id, Votes.username == current_user.username).first()
-    if user_vote:
-        if(user_vote.vote==vote):
-            return user_vote
-        elif(vote==0):
-            if(user_vote.vote==1):
-                db.query(Complaint).filter(Complaint.id == complaint_id).update({Complaint.like_count: Complaint.like_count - 1})
-            else:
-                db.query(Complaint).filter(Complaint.id == complaint_id).update({Complaint.like_count: Complaint.like_count + 1})
-            db.query(Votes).filter(Votes.complaint_id == complaint_id, Votes.username == current_user.username).delete()
-            db.commit()
-            user_vote.vote=vote
-            return user_vote
-        else:
-            db.query(Complaint).filter(Complaint.id == complaint_id).update({Complaint.like_count: Complaint.like_count + (vote*2)})
-            user_vote.vote=vote
-            db.commit()
-            return user_vote
-    else :
-        if(vote==0):
-            return {
-                "complaint_id":complaint_id,
-                "username":current_user.username,
-                "vote":vote
-            }
-        db_vote = Votes(complaint_id=complaint_id, username=current_user.username, vote=vote)
-        db.query(Complaint).filter(Complaint.id == complaint_id).update({Complaint.like_count: Complaint.like_count + vote})
-        db.add(db_vote)
-        db.commit()
-        db.refresh(db_vote)
-        return db_vote
-
-
-def get_user_votes(db: Session, username: str):
-    user_votes = db.query(Votes).filter(Votes.username == username).all()
+    return like_count[0] + vote_buffer.pending(complaint_id)
+
+async def create_buffered_post_vote(db:AsyncSession, complaint_id:int, vote:int, current_user: UserBase ):
+    vote_filter = (Votes.complaint_id == complaint_id, Votes.username == current_user.username)
+    # write first (a placeholder row, only if the complaint exists) so the read below happens under the write/row lock
+    placeholder = upsert_insert(db, Votes).from_select(
+        ["username", "complaint_id", "vote"],
+        select(literal(current_user.username), Complaint.id, literal(0)).where(Complaint.id == complaint_id),
+    )
+    await db.execute(placeholder.on_conflict_do_nothing(index_elements=[Votes.username, Votes.complaint_id]))
+    previous_vote = (await db.execute(select(Votes.vote).where(*vote_filter).with_for_update())).scalar()
+    if previous_vote is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Complaint Not found")
+    if vote == 0:
+        await db.execute(delete(Votes).where(*vote_filter))
+    elif vote != previous_vote:
+        await db.execute(update(Votes).where(*vote_filter).values(vote=vote).execution_options(synchronize_session=False))
+    await db.commit()
+    vote_buffer.add(complaint_id, vote - previous_vote)
+    return {
+        "complaint_id":complaint_id,
+        "username":current_user.username,
+        "vote":vote
+    }
+
+def _is_lock_contention(error: DBAPIError) -> bool:
+    # sqlite lock waits that outlasted busy_timeout, postgres serialization failures and deadlocks
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return code in ("40001", "40P01") or "database is locked" in str(error.orig)
+
+async def create_post_vote(db:AsyncSession, complaint_id:int, vote:int, current_user: UserBase ):
+    # voters of a popular complaint queue on its row (on sqlite, on the write lock); a transaction
+    # that loses that race rolled back as a whole, so it is replayed after a jittered backoff
+    for attempt in range(db_settings.VOTE_MAX_ATTEMPTS):
+        try:
+            if vote_buffer.enabled:
+                return await create_buffered_post_vote(db, complaint_id, vote, current_user)
+            return await create_unbuffered_post_vote(db, complaint_id, vote, current_user)
+        except DBAPIError as error:
+            await db.rollback()
+            if not _is_lock_contention(error):
+                raise
+        await asyncio.sleep(random.uniform(0, db_settings.VOTE_RETRY_BASE_MS * 2 ** attempt) / 1000)
+    raise HTTPException(status_code=503, detail="Too many concurrent votes, try again", headers={"Retry-After": "1"})
+
+async def create_unbuffered_post_vote(db:AsyncSession, complaint_id:int, vote:int, current_user: UserBase ):
+    previous_vote = select(Votes.vote).where(Votes.complaint_id == complaint_id, Votes.username == current_user.username).scalar_subquery()
+    if db.get_bind().dialect.name == "postgresql":
+        # take the row lock first so the delta below is computed from a snapshot taken after it
+        await db.execute(select(Complaint.id).where(Complaint.id == complaint_id).with_for_update())
+    # apply the delta against the stored vote in one statement; on sqlite this also takes the write lock,
+    # so the vote upsert below cannot interleave with another writer
+    result = await db.execute(
+        update(Complaint)
+        .where(Complaint.id == complaint_id)
+        .values(like_count=Complaint.like_count + vote - func.coalesce(previous_vote, 0))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Complaint Not found")
+    # same delta, still read against the stored vote
+    await db.execute(vote_rollup_statement(literal(vote) - func.coalesce(previous_vote, 0)), {"b_id": complaint_id})
+    if vote == 0:
+        await db.execute(delete(Votes).where(Votes.complaint_id == complaint_id, Votes.username == current_user.username))
+    else:
+        upsert = upsert_insert(db, Votes).values(username=current_user.username, complaint_id=complaint_id, vote=vote)
+        await db.execute(upsert.on_conflict_do_update(
+            index_elements=[Votes.username, Votes.complaint_id],
+            set_={"vote": upsert.excluded.vote},
+        ))
+    await db.commit()
+    return {
+        "complaint_id":complaint_id,
+        "username":current_user.username,
+        "vote":vote
+    }
+
+
+async def get_user_votes(db: AsyncSession, username: str):
+    user_votes = (await db.execute(select(Votes).where(Votes.username == username))).scalars().all()
+    return user_votes
+
+async def get_user_votes_for(db: AsyncSession, username: str, complaint_ids: List[int]):
+    if not complaint_ids:
+        return []
+    user_votes = (await db.execute(select(Votes).where(Votes.username == username, Votes.complaint_id.in_(complaint_ids)))).scalars().all()
     return user_votes
 
-def get_user_vote(db: Session, username: str, complaint_id: int):
-    user_vote = db.query(Votes).filter(Votes.username == username, Votes.complaint_id == complaint_id).first()
+async def get_user_vote(db: AsyncSession, username: str, complaint_id: int):
+    user_vote = (await db.execute(select(Votes).where(Votes.username == username, Votes.complaint_id == complaint_id))).scalars().first()
     return user_vote
 
-def get_complaint_updates(db: Session, complaint_id: int):
-    complaint_updates = db.query(ComplaintUpdate).filter(ComplaintUpdate.complaint_id == complaint_id).order_by(ComplaintUpdate.created_at.desc()).all()
+async def get_complaint_updates(db: AsyncSession, complaint_id: int):
+    complaint_updates = (await db.execute(select(ComplaintUpdate).where(ComplaintUpdate.complaint_id == complaint_id).order_by(ComplaintUpdate.created_at.desc()))).scalars().all()
     return complaint_updates
 
-def get_complaint_resolver(db: Session, complaint_id: int):
-    complaint_resolver = db.query(ComplaintStatus).filter(ComplaintStatus.complaint_id == complaint_id).first()
+async def get_complaint_resolver(db: AsyncSession, complaint_id: int):
+    complaint_resolver = (await db.execute(select(ComplaintStatus).where(ComplaintStatus.complaint_id == complaint_id))).scalars().first()
     return complaint_resolver
 
-def get_councillor(db: Session, ward_id: int):
-    councillor = db.query(WardServantProfile).filter(WardServantProfile.ward_id == ward_id, WardServantProfile.position == "NAGARSEVAK").first()
+async def get_councillor(db: AsyncSession, ward_id: int):
+    councillor = (await db.execute(select(WardServantProfile).where(WardServantProfile.ward_id == ward_id, WardServantProfile.position == "NAGARSEVAK"))).scalars().first()
     return councillor
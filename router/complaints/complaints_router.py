@@ -1,17 +1,23 @@
 
 from typing import List, Union
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-
-from database.db import SessionLocal
-from database.dependency import get_db
-from database.schemas import (CommentCreate, CommentResponse, ComplaintCreate,
-                              ComplaintListResponse, ComplaintResponse,
-                              ComplaintResponseBase, ComplaintUpdateResponse,
-                              CouncillorBase, MessageWithStatus,
-                              UpdatedComplaint, UserBase, VoteResponse)
-from router.auth.auth_functions import get_current_active_user
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.dependency import get_async_db
+from database.schemas import (CommentCreate, CommentResponse,
+                              CommentTreeResponse, ComplaintCreate,
+                              ComplaintListResponse, ComplaintNearbyResponse,
+                              ComplaintResponse, ComplaintResponseBase,
+                              ComplaintSearchResponse, ComplaintUpdateResponse,
+                              CouncillorBase, DuplicateComplaintsConflict,
+                              MessageWithStatus, UpdatedComplaint, UserBase,
+                              VoteResponse)
+from router.auth.auth_functions import (get_current_active_user,
+                                        get_optional_username)
+from router.complaints.complaint_nearby import (NEARBY_MAX_RADIUS_M,
+                                               nearby_complaints)
+from router.complaints.complaint_search import search_complaints
 from router.complaints.complaints_functions import (create_comment,
                                                     create_complaint,
                                                     create_post_vote,
@@ -19,10 +25,11 @@ from router.complaints.complaints_functions import (create_comment,
                                                     get_complaint,
                                                     get_complaint_resolver,
                                                     get_complaint_updates,
-                                                    get_complaints,
+                                                    get_complaints_json,
                                                     get_councillor,
                                                     get_user_vote,
                                                     get_user_votes,
+                                                    get_user_votes_for,
                                                     get_vote_count,
                                                     reform_complaint,
                                                     reform_complaint_status)
@@ -33,60 +40,80 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# declared before the ward feed so "search" and "nearby" are never taken for a ward slug
+@router.get("/search", response_model=List[ComplaintSearchResponse])
+async def search(q: str = Query(..., min_length=1, max_length=200), ward_slug: Union[str, None] = None, complaint_type: Union[int, None] = None, status: Union[str, None] = Query(default=None, regex="^(PENDING|COMPLETED)$"), skip: int = 0, limit: int = Query(default=30, ge=1, le=100), db: AsyncSession = Depends(get_async_db)):
+    return await search_complaints(db, q, ward_slug, complaint_type, status, skip, limit)
+
+# radius in metres; results are nearest first with their distance
+@router.get("/nearby", response_model=List[ComplaintNearbyResponse])
+async def nearby(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180), radius: float = Query(default=1000, gt=0, le=NEARBY_MAX_RADIUS_M), complaint_type: Union[int, None] = None, status: Union[str, None] = Query(default=None, regex="^(PENDING|COMPLETED)$"), limit: int = Query(default=30, ge=1, le=100), db: AsyncSession = Depends(get_async_db)):
+    return await nearby_complaints(db, lat, lon, radius, complaint_type, status, limit)
+
 @router.get("/{ward_slug}/", response_model=List[ComplaintListResponse])
-def read_complaints(ward_slug: str,skip: int = 0, limit: int = 30, recent: bool = False, resolved: bool = False, db: Session = Depends(get_db)):
-    return get_complaints(db, skip, limit, ward_slug,recent,resolved )
+async def read_complaints(ward_slug: str, skip: int = Query(default=0, ge=0), limit: int = Query(default=30, ge=1, le=100), recent: bool = False, resolved: bool = False, cursor: Union[str, None] = None, include_my_vote: bool = False, db: AsyncSession = Depends(get_async_db), username: Union[str, None] = Depends(get_optional_username)):
+    # response_model documents the payload; the body is already encoded so validation is skipped
+    body, next_cursor = await get_complaints_json(db, skip, limit, ward_slug,recent,resolved, cursor, username if include_my_vote else None)
+    response = Response(content=body, media_type="application/json")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
 @router.get("/{ward_slug}/{complaint_id}/", response_model=ComplaintResponse)
-def read_complaint(ward_slug: str, complaint_id: int, db: Session = Depends(get_db)):
-    return get_complaint(db, ward_slug, complaint_id)
+async def read_complaint(ward_slug: str, complaint_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await get_complaint(db, ward_slug, complaint_id)
 
-@router.post("/", response_model=ComplaintResponseBase)
-async def post_complaint(complaint: ComplaintCreate, db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
-    return await create_complaint(db, complaint, current_user)
+# 409 lists similar pending complaints nearby; allow_duplicate=true files it anyway
+@router.post("/", response_model=ComplaintResponseBase, responses={409: {"model": DuplicateComplaintsConflict}})
+async def post_complaint(complaint: ComplaintCreate, allow_duplicate: bool = False, db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
+    return await create_complaint(db, complaint, current_user, allow_duplicate)
 
 @router.patch("/{complaint_id}/")#, response_model=ComplaintResponseBase)
-async def update_complaint(complaint_id: int, complaint: UpdatedComplaint, db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
+async def update_complaint(complaint_id: int, complaint: UpdatedComplaint, db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
     return await reform_complaint(db, complaint, current_user, complaint_id)
 
 @router.patch("/{complaint_id}/update_status/", response_model=MessageWithStatus)
-async def update_complaint_status(complaint_id: int, db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
+async def update_complaint_status(complaint_id: int, db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
     return await reform_complaint_status(db,  complaint_id,current_user)
 
-@router.get("/{complaint_id}/comments", response_model=List[CommentResponse])
-def read_comments(complaint_id: int, parent_comment_id: Union[int,None] = Query(default=None), db: Session = Depends(get_db)):
-    return get_comments(db, complaint_id,parent_comment_id)
+@router.get("/{complaint_id}/comments", response_model=List[CommentTreeResponse])
+async def read_comments(complaint_id: int, parent_comment_id: Union[int,None] = Query(default=None), depth: int = Query(default=1, ge=1, le=10), limit_per_level: Union[int,None] = Query(default=None, ge=1), db: AsyncSession = Depends(get_async_db)):
+    return await get_comments(db, complaint_id,parent_comment_id, depth, limit_per_level)
 
 @router.post("/{complaint_id}/comments/", response_model=CommentResponse)
-def post_comment(comment: CommentCreate, complaint_id: int, db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
-    return create_comment(db, complaint_id, comment, current_user)
+async def post_comment(comment: CommentCreate, complaint_id: int, db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
+    return await create_comment(db, complaint_id, comment, current_user)
 
         
 
 @router.post("/{complaint_id}/vote", response_model=VoteResponse)
-def vote_post(complaint_id: int, vote: str=Query(default=None,regex="^(-1|0|1)$"), db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
-    return create_post_vote(db, complaint_id, int(vote), current_user)
+async def vote_post(complaint_id: int, vote: str=Query(default=None,regex="^(-1|0|1)$"), db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
+    return await create_post_vote(db, complaint_id, int(vote), current_user)
 
 @router.get("/{complaint_id}/vote", response_model=VoteResponse)
-def user_vote(complaint_id: int, db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
-    return get_user_vote(db, current_user.username,complaint_id )
+async def user_vote(complaint_id: int, db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
+    return await get_user_vote(db, current_user.username,complaint_id )
+
+@router.get("/my_votes", response_model=List[VoteResponse])
+async def my_votes(complaint_ids: List[int] = Query(default=[], max_items=100), db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
+    return await get_user_votes_for(db, current_user.username, complaint_ids)
 
 @router.get("/uservotes", response_model=List[VoteResponse])
-def user_votes(db: Session = Depends(get_db), current_user: UserBase = Depends(get_current_active_user)):
-    return get_user_votes(db, current_user.username)
+async def user_votes(db: AsyncSession = Depends(get_async_db), current_user: UserBase = Depends(get_current_active_user)):
+    return await get_user_votes(db, current_user.username)
 
 @router.get("/{complaint_id}/vote_count")
-def vote_count(complaint_id: int, db: Session = Depends(get_db)):
-    return get_vote_count(db, complaint_id)
+async def vote_count(complaint_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await get_vote_count(db, complaint_id)
 
 @router.get("/{complaint_id}/complaint_updates", response_model=List[ComplaintUpdateResponse])
-def complaint_updates(complaint_id: int, db: Session = Depends(get_db)):
-    return get_complaint_updates(db, complaint_id)
+async def complaint_updates(complaint_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await get_complaint_updates(db, complaint_id)
 
 @router.get("/{complaint_id}/complaint_resolver")
-def complaint_resolver(complaint_id: int, db: Session = Depends(get_db)):
-    return get_complaint_resolver(db, complaint_id)
+async def complaint_resolver(complaint_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await get_complaint_resolver(db, complaint_id)
 
 @router.get("/{complaint_id}/councillor",response_model=CouncillorBase)
-def councillor(complaint_id: int, db: Session = Depends(get_db)):
-    return get_councillor(db, complaint_id)
+async def councillor(complaint_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await get_councillor(db, complaint_id)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func, select, update
+
+from database.config import db_settings
+from database.db import AsyncSessionLocal
+from database.models import Complaint, Votes
+from router.ward.ward_rollups import (rebuild_vote_totals_statement,
+                                      vote_rollup_statement)
+
+logger = logging.getLogger(__name__)
+
+complaints_table = Complaint.__table__
+
+
+# recompute every like_count from the votes table (crash recovery for buffered deltas)
+def rebuild_like_counts_statement():
+    vote_total = select(func.coalesce(func.sum(Votes.vote), 0)).where(Votes.complaint_id == complaints_table.c.id).scalar_subquery()
+    return update(complaints_table).values(like_count=vote_total)
+
+
+class VoteCounterBuffer:
+    # collects per-complaint like_count deltas in memory and applies them in one batched UPDATE per interval,
+    # so concurrent voters on a viral complaint no longer queue on its row lock
+    def __init__(self, enabled: bool, flush_interval_ms: int, session_factory=AsyncSessionLocal):
+        self.enabled = enabled
+        self.flush_interval = flush_interval_ms / 1000
+        self.session_factory = session_factory
+        self._deltas = defaultdict(int)
+        self._flushing = {}
+        self._flush_lock = asyncio.Lock()
+        self._stopped = asyncio.Event()
+
+    def add(self, complaint_id: int, delta: int):
+        if delta:
+            self._deltas[complaint_id] += delta
+
+    # buffered delta not yet visible in complaints.like_count
+    def pending(self, complaint_id: int) -> int:
+        return self._deltas.get(complaint_id, 0) + self._flushing.get(complaint_id, 0)
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        if not self._deltas:
+            return 0
+        flushing, self._deltas = self._deltas, defaultdict(int)
+        self._flushing = flushing
+        rows = [{"b_id": complaint_id, "b_delta": delta} for complaint_id, delta in sorted(flushing.items()) if delta]
+        try:
+            if rows:
+                async with self.session_factory() as db:
+                    await db.execute(
+                        update(complaints_table)
+                        .where(complaints_table.c.id == bindparam("b_id"))
+                        .values(like_count=complaints_table.c.like_count + bindparam("b_delta")),
+                        rows,
+                    )
+                    await db.execute(vote_rollup_statement(), rows)
+                    await db.commit()
+                    # like_count has the deltas now; drop them from pending() before anything else runs
+                    self._flushing = {}
+        except Exception:
+            if self._flushing is flushing:
+                # not committed, keep the deltas for the next round
+                for complaint_id, delta in flushing.items():
+                    self._deltas[complaint_id] += delta
+                self._flushing = {}
+            raise
+        self._flushing = {}
+        return len(rows)
+
+    async def run(self):
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("vote buffer flush failed")
+
+    async def replay(self):
+        # deltas lost with the process never reached either counter
+        async with self.session_factory() as db:
+            await db.execute(rebuild_like_counts_statement())
+            await db.execute(rebuild_vote_totals_statement())
+            await db.commit()
+
+    def stop(self):
+        self._stopped.set()
+
+
+vote_buffer = VoteCounterBuffer(
+    enabled=db_settings.VOTE_BUFFER_ENABLED,
+    flush_interval_ms=db_settings.VOTE_BUFFER_FLUSH_MS,
+)
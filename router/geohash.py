@@ -0,0 +1,99 @@
+import math
+from typing import List, Tuple, Union
+
+import numpy as np
+
+# geohash cells: base32 strings where every extra character narrows the cell, so all points
+# inside a cell share its prefix and a prefix is a contiguous range of an ordinary btree index
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9  # about 4.8m x 4.8m, finer than any phone gps fix
+EARTH_RADIUS_M = 6371008.8
+MAX_COVERING_CELLS = 12
+
+
+def encode(latitude: float, longitude: float, precision: int = PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if target >= middle:
+            value = value * 2 + 1
+            bounds[0] = middle
+        else:
+            value = value * 2
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    # (height, width) of a cell in degrees; longitude takes the odd bit
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lon_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def prefix_range(prefix: str) -> Tuple[str, Union[str, None]]:
+    # [start, end) of the index range holding every hash that starts with prefix. the end is
+    # the next prefix of the same length, so the bound never relies on collation of symbols
+    for position in range(len(prefix) - 1, -1, -1):
+        index = BASE32.index(prefix[position])
+        if index < len(BASE32) - 1:
+            return prefix, prefix[:position] + BASE32[index + 1]
+    return prefix, None
+
+
+def covering_cells(min_lat: float, max_lat: float, min_lon: float, max_lon: float, max_cells: int = MAX_COVERING_CELLS) -> List[str]:
+    # the finest grid of cells that covers the box in at most max_cells cells. an empty list
+    # means even single character cells would need more, so the caller should not filter on cells
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lon, max_lon = max(min_lon, -180.0), min(max_lon, 180.0)
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        first_row = math.floor((min_lat + 90.0) / height)
+        last_row = min(math.floor((max_lat + 90.0) / height), round(180.0 / height) - 1)
+        first_column = math.floor((min_lon + 180.0) / width)
+        last_column = min(math.floor((max_lon + 180.0) / width), round(360.0 / width) - 1)
+        if (last_row - first_row + 1) * (last_column - first_column + 1) <= max_cells:
+            return [
+                encode(-90.0 + (row + 0.5) * height, -180.0 + (column + 0.5) * width, precision)
+                for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)
+            ]
+    return []
+
+
+def bounding_box(latitude: float, longitude: float, radius_m: float) -> Tuple[float, float, float, float]:
+    # (min_lat, max_lat, min_lon, max_lon) of the circle; the longitude span is left open
+    # when the circle reaches a pole or crosses the antimeridian rather than wrapping
+    angular = radius_m / EARTH_RADIUS_M
+    lat_delta = math.degrees(angular)
+    cos_lat = math.cos(math.radians(latitude))
+    if math.sin(angular) < cos_lat:
+        lon_delta = math.degrees(math.asin(math.sin(angular) / cos_lat))
+    else:
+        lon_delta = 360.0
+    if longitude - lon_delta < -180.0 or longitude + lon_delta > 180.0:
+        lon_delta = 360.0
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+
+def haversine_m(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    # great-circle distance in metres from one point to many, in one vectorized pass
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - math.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database.config import db_settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    # one per request, shared by reference with threadpool workers running sync handlers
+    __slots__ = ("query_count", "db_time")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+
+
+request_stats: ContextVar[Union[RequestStats, None]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels) -> str:
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.db_seconds = {}
+        self.responses = {}
+        self.slow_queries = 0
+
+    def record_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.queries[key] = Histogram(QUERY_BUCKETS)
+                self.db_seconds[key] = 0.0
+            self.latency[key].observe(elapsed)
+            self.queries[key].observe(stats.query_count)
+            self.db_seconds[key] += stats.db_time
+            status_key = (method, route, status)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def record_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def _histogram_lines(self, name: str, histograms: dict) -> list:
+        lines = []
+        for (method, route), histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(name, _labels(method=method, route=route, le=bound), cumulative))
+            lines.append("{}_bucket{} {}".format(name, _labels(method=method, route=route, le="+Inf"), histogram.count))
+            lines.append("{}_sum{} {}".format(name, _labels(method=method, route=route), histogram.sum))
+            lines.append("{}_count{} {}".format(name, _labels(method=method, route=route), histogram.count))
+        return lines
+
+    def render(self, gauges: dict = None) -> str:
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Responses by route and status code.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.responses.items()):
+                lines.append("http_requests_total{} {}".format(_labels(method=method, route=route, status=status), count))
+            lines += [
+                "# HELP http_request_duration_seconds Time from request to the end of the response body.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            lines += self._histogram_lines("http_request_duration_seconds", self.latency)
+            lines += [
+                "# HELP http_request_db_queries SQL statements issued per request.",
+                "# TYPE http_request_db_queries histogram",
+            ]
+            lines += self._histogram_lines("http_request_db_queries", self.queries)
+            lines += [
+                "# HELP http_request_db_seconds_total Time spent executing SQL statements.",
+                "# TYPE http_request_db_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append("http_request_db_seconds_total{} {}".format(_labels(method=method, route=route), seconds))
+            lines += [
+                "# HELP db_slow_queries_total Statements slower than SLOW_QUERY_THRESHOLD_MS.",
+                "# TYPE db_slow_queries_total counter",
+                "db_slow_queries_total {}".format(self.slow_queries),
+            ]
+        for name, (help_text, value) in (gauges or {}).items():
+            lines += ["# HELP {} {}".format(name, help_text), "# TYPE {} gauge".format(name), "{} {}".format(name, value)]
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def instrument_engine(engine: Engine, registry: MetricsRegistry = metrics_registry, slow_query_ms: int = db_settings.SLOW_QUERY_THRESHOLD_MS):
+    # for an AsyncEngine pass async_engine.sync_engine, the events fire on the sync core
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        stats = request_stats.get()
+        if stats is not None:
+            stats.query_count += 1
+            stats.db_time += elapsed
+        if slow_query_ms and elapsed * 1000 >= slow_query_ms:
+            registry.record_slow_query()
+            logger.warning("slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+
+def _route_templates(routes, prefix: str = "") -> dict:
+    templates = {}
+    for route in routes:
+        if isinstance(route, Mount):
+            templates.update(_route_templates(getattr(route.app, "routes", ()), prefix + route.path))
+        elif hasattr(route, "endpoint"):
+            templates[route.endpoint] = prefix + route.path
+    return templates
+
+
+class InstrumentationMiddleware:
+    # times every http request, counts the SQL it issued and reports both in a Server-Timing header
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = metrics_registry) -> None:
+        self.app = app
+        self.registry = registry
+        self._templates = None
+
+    def _route(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None or "router" not in scope:
+            return UNMATCHED_ROUTE
+        if self._templates is None:
+            # label by path template, not raw path, to keep the series count bounded
+            self._templates = _route_templates(scope["router"].routes)
+        return self._templates.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", 'app;dur={:.1f}, db;dur={:.1f};desc="{} queries"'.format(
+                    (time.perf_counter() - started) * 1000, stats.db_time * 1000, stats.query_count
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            self.registry.record_request(scope["method"], self._route(scope), status, time.perf_counter() - started, stats)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.dependency import get_async_db
+from database.mail_queue import queue_depth
+from router.auth.password_hashing import password_hasher
+from router.metrics.instrumentation import metrics_registry
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics(db: AsyncSession = Depends(get_async_db)):
+    hasher = password_hasher.stats()
+    mail = await queue_depth(db)
+    gauges = {
+        "password_hash_running": ("Password hashes running on the hashing pool.", hasher["running"]),
+        "password_hash_queued": ("Password hashes waiting for a hashing thread.", hasher["queued"]),
+    }
+    lines = [
+        "# HELP password_hash_rejected_total Password hashes refused because the pool was saturated.",
+        "# TYPE password_hash_rejected_total counter",
+        "password_hash_rejected_total {}".format(hasher["rejected"]),
+        "# HELP mail_queue_messages Outbound emails not yet delivered, by status.",
+        "# TYPE mail_queue_messages gauge",
+    ]
+    lines += ['mail_queue_messages{{status="{}"}} {}'.format(status, count) for status, count in mail.items()]
+    body = metrics_registry.render(gauges) + "\n".join(lines) + "\n"
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
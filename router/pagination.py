@@ -0,0 +1,32 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+# opaque keyset cursors: urlsafe base64 of a json list holding the ordering they were
+# issued for, the sort key and the row id. a cursor only seeks within its own ordering
+
+
+def encode_cursor(kind: str, sort_key, row_id: int) -> str:
+    if isinstance(sort_key, datetime):
+        sort_key = {"dt": sort_key.isoformat()}
+    raw = json.dumps([kind, sort_key, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str, key_type: type):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_kind, sort_key, row_id = json.loads(raw)
+        if isinstance(sort_key, dict):
+            sort_key = datetime.fromisoformat(sort_key["dt"])
+        row_id = int(row_id)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_kind != kind:
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different ordering")
+    # a key of another type would be compared against the sort column as is
+    if not isinstance(sort_key, key_type) or isinstance(sort_key, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_key, row_id
@@ -1,34 +1,44 @@
-# from database.crud import get_district, get_municipality, get_ward
-from database.crud import get_district, get_municipality, get_ward
-from database.models import Complaint, UserProfile, Ward
+from database.models import (Complaint, District, Municipality, UserProfile,
+                             Ward)
 from database.schemas import UserBase, UserProfileBaseSchema, UserProfileSchema
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
-def get_user_profile(current_user: UserBase,db:Session)->UserProfileSchema:
-    user_profile = db.query(UserProfile).filter(UserProfile.username == current_user.username).first()
-    total_completed_complaints= db.query(Complaint).filter(Complaint.username == current_user.username, Complaint.completed_status == "COMPLETED").count()
-    total_pending_complaints= db.query(Complaint).filter(Complaint.username == current_user.username, Complaint.completed_status == "PENDING").count()
-    ward = get_ward(db, user_profile.ward)
-    municipality = get_municipality(db, user_profile.municipality)
-    district = get_district(db, user_profile.district)
+async def get_user_profile(current_user: UserBase,db:AsyncSession)->UserProfileSchema:
+    # one round-trip: profile joined with its geography, complaint counts are kept on the profile row
+    row = (await db.execute(
+        select(
+            UserProfile,
+            Ward.ward_slug,
+            Ward.ward_name,
+            Municipality.municipality_name,
+            District.district_name,
+        )
+        .outerjoin(Ward, Ward.ward_id == UserProfile.ward)
+        .outerjoin(Municipality, Municipality.municipality_id == UserProfile.municipality)
+        .outerjoin(District, District.district_id == UserProfile.district)
+        .where(UserProfile.username == current_user.username)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Profile Not found")
     return UserProfileSchema(
-        **user_profile.__dict__,
+        **row.UserProfile.__dict__,
         email=current_user.email,
-        ward_slug=ward.ward_slug,
-        municipality_name = municipality.municipality_name,
-        district_name = district.district_name,
-        ward_name = ward.ward_name,
-        total_completed_complaints=total_completed_complaints,
-        total_pending_complaints=total_pending_complaints
+        ward_slug=row.ward_slug,
+        municipality_name = row.municipality_name,
+        district_name = row.district_name,
+        ward_name = row.ward_name,
+        total_completed_complaints=row.UserProfile.completed_complaints_count,
+        total_pending_complaints=row.UserProfile.pending_complaints_count
     )
 
-def reform_user_profile(user_profile:UserProfileBaseSchema,current_user: UserBase,db:Session):
-    municipality_id = get_ward(db, user_profile.ward).municipality_id
-    district_id = get_municipality(db, municipality_id).district_id
+async def reform_user_profile(user_profile:UserProfileBaseSchema,current_user: UserBase,db:AsyncSession):
+    municipality_id = (await db.execute(select(Ward.municipality_id).where(Ward.ward_id == user_profile.ward))).scalar()
+    district_id = (await db.execute(select(Municipality.district_id).where(Municipality.municipality_id == municipality_id))).scalar()
     try:
-        db_user_profile =  db.query(UserProfile).filter(UserProfile.username == current_user.username).first()
+        db_user_profile =  (await db.execute(select(UserProfile).where(UserProfile.username == current_user.username))).scalars().first()
         db_user_profile.first_name = user_profile.first_name
         db_user_profile.profile_picture = user_profile.profile_picture
         db_user_profile.last_name = user_profile.last_name
@@ -36,13 +46,12 @@ def reform_user_profile(user_profile:UserProfileBaseSchema,current_user: UserBas
         db_user_profile.district = district_id
         db_user_profile.municipality = municipality_id
         db_user_profile.ward = user_profile.ward
-        db.commit()
-        db.refresh(db_user_profile)
+        await db.commit()
+        await db.refresh(db_user_profile)
         return db_user_profile
     except Exception as e:
         raise HTTPException(status_code=500, detail=str("Internal server error"))
 
-def get_user_complaints(username:str, db:Session):
-    complaints = db.query(Complaint, Ward).filter(Complaint.username == username, Ward.ward_id== Complaint.ward_id).all()
+async def get_user_complaints(username:str, db:AsyncSession):
+    complaints = (await db.execute(select(Complaint, Ward).where(Complaint.username == username, Ward.ward_id== Complaint.ward_id))).all()
     return complaints
-    
\ No newline at end of file
@@ -0,0 +1,29 @@
+from typing import List, Tuple
+
+from database.models import Complaint, UserProfile
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+
+# recompute per-user complaint counters from the complaints table;
+# returns (username, stored_completed, actual_completed, stored_pending, actual_pending) for every drifted row
+def reconcile_complaint_counters(db: Session, fix: bool = True) -> List[Tuple[str, int, int, int, int]]:
+    actual = db.query(
+        Complaint.username,
+        func.sum(case((Complaint.completed_status == "COMPLETED", 1), else_=0)),
+        func.sum(case((Complaint.completed_status == "PENDING", 1), else_=0)),
+    ).group_by(Complaint.username).all()
+    actual_counts = {username: (completed or 0, pending or 0) for username, completed, pending in actual}
+    drift = []
+    for profile in db.query(UserProfile).yield_per(1000):
+        completed, pending = actual_counts.get(profile.username, (0, 0))
+        if (profile.completed_complaints_count, profile.pending_complaints_count) == (completed, pending):
+            continue
+        drift.append((profile.username, profile.completed_complaints_count, completed, profile.pending_complaints_count, pending))
+    if fix and drift:
+        db.bulk_update_mappings(UserProfile, [
+            {"username": username, "completed_complaints_count": completed, "pending_complaints_count": pending}
+            for username, _, completed, _, pending in drift
+        ])
+        db.commit()
+    return drift
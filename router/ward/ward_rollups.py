@@ -0,0 +1,203 @@
+import bisect
+import datetime
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.crud import upsert_insert
+from database.models import (Complaint, ComplaintType, WardDailyStats,
+                             WardResolutionBucket)
+
+# upper edges of the resolution time buckets, in hours; the last bucket is open ended
+RESOLUTION_BUCKET_HOURS = (1, 3, 6, 12, 24, 48, 72, 120, 168, 336, 720, 1440, 2160)
+STATS_COUNTERS = ("created_count", "completed_count", "vote_total", "resolution_seconds")
+BUCKET_COUNTERS = ("complaint_count",)
+REBUILD_BATCH_ROWS = 100
+
+
+def resolution_bucket(seconds: float) -> int:
+    return bisect.bisect_left(RESOLUTION_BUCKET_HOURS, seconds / 3600)
+
+
+def _merge(model, rows: list, counters: tuple) -> list:
+    # sums rows sharing a key, postgres refuses to update the same row twice in one statement
+    key_columns = [column.name for column in model.__table__.primary_key.columns]
+    merged = defaultdict(lambda: dict.fromkeys(counters, 0))
+    for row in rows:
+        totals = merged[tuple(row[column] for column in key_columns)]
+        for counter in counters:
+            totals[counter] += row.get(counter, 0)
+    return [dict(zip(key_columns, key), **totals) for key, totals in merged.items() if any(totals.values())]
+
+
+def _increment(db, model, values: list, counters: tuple):
+    # one multi-row upsert adding each row's counters onto the stored ones
+    statement = upsert_insert(db, model).values(values)
+    return statement.on_conflict_do_update(
+        index_elements=[column.name for column in model.__table__.primary_key.columns],
+        set_={counter: getattr(model, counter) + getattr(statement.excluded, counter) for counter in counters},
+    )
+
+
+def _contribution(complaint, sign: int = 1):
+    # what one complaint adds to the rollups: (stats row, resolution bucket row or None)
+    key = {"ward_id": complaint.ward_id, "complaint_type": complaint.complaint_type, "day": complaint.created_at.date()}
+    stats = dict(key, created_count=sign, vote_total=sign * (complaint.like_count or 0))
+    bucket = None
+    if complaint.completed_status == "COMPLETED":
+        stats["completed_count"] = sign
+        # complaints resolved before completed_at existed count as resolved, with no duration
+        if complaint.completed_at:
+            seconds = int((complaint.completed_at - complaint.created_at).total_seconds())
+            stats["resolution_seconds"] = sign * seconds
+            bucket = dict(key, bucket=resolution_bucket(seconds), complaint_count=sign)
+    return stats, bucket
+
+
+async def _apply(db: AsyncSession, stats_rows: list, bucket_rows: list):
+    for model, rows, counters in ((WardDailyStats, stats_rows, STATS_COUNTERS), (WardResolutionBucket, bucket_rows, BUCKET_COUNTERS)):
+        values = _merge(model, rows, counters)
+        if values:
+            await db.execute(_increment(db, model, values, counters))
+
+
+async def record_complaint(db: AsyncSession, complaint, sign: int = 1):
+    # adds a complaint to the rollups, or takes it out again with sign=-1 before its ward or type changes
+    stats, bucket = _contribution(complaint, sign)
+    await _apply(db, [stats], [bucket] if bucket else [])
+
+
+async def record_completion(db: AsyncSession, complaint):
+    # a counted complaint was just resolved; its completed_at is already set
+    seconds = int((complaint.completed_at - complaint.created_at).total_seconds())
+    key = {"ward_id": complaint.ward_id, "complaint_type": complaint.complaint_type, "day": complaint.created_at.date()}
+    await _apply(
+        db,
+        [dict(key, completed_count=1, resolution_seconds=seconds)],
+        [dict(key, bucket=resolution_bucket(seconds), complaint_count=1)],
+    )
+
+
+def vote_rollup_statement(delta=None):
+    # adds a vote delta to the stats row of the complaint's ward, type and day, looked up in the
+    # same statement. run with b_id (and b_delta when no delta expression is given), once per
+    # vote or executemany'd over a batch of buffered deltas. the row exists from the complaint's
+    # creation or the last rebuild, so a plain update does, and unlike an upsert it is cached
+    delta = bindparam("b_delta") if delta is None else delta
+    key = select(Complaint.ward_id, Complaint.complaint_type, func.date(Complaint.created_at)).where(Complaint.id == bindparam("b_id"))
+    return update(WardDailyStats).where(
+        tuple_(WardDailyStats.ward_id, WardDailyStats.complaint_type, WardDailyStats.day).in_(key)
+    ).values(vote_total=WardDailyStats.vote_total + delta).execution_options(synchronize_session=False)
+
+
+def rebuild_vote_totals_statement():
+    # recomputes only vote_total from the like_counts, for after those were rebuilt from votes
+    like_total = select(func.coalesce(func.sum(Complaint.like_count), 0)).where(
+        Complaint.ward_id == WardDailyStats.ward_id,
+        Complaint.complaint_type == WardDailyStats.complaint_type,
+        func.date(Complaint.created_at) == WardDailyStats.day,
+    ).scalar_subquery()
+    return update(WardDailyStats).values(vote_total=like_total).execution_options(synchronize_session=False)
+
+
+def rebuild_ward_rollups(db: Session) -> int:
+    # like_count must be settled first: run with the vote buffer flushed or disabled
+    db.query(WardResolutionBucket).delete(synchronize_session=False)
+    db.query(WardDailyStats).delete(synchronize_session=False)
+    stats_rows = []
+    bucket_rows = []
+    complaints = db.query(
+        Complaint.ward_id, Complaint.complaint_type, Complaint.created_at, Complaint.completed_at,
+        Complaint.completed_status, Complaint.like_count,
+    ).filter(Complaint.ward_id.isnot(None), Complaint.complaint_type.isnot(None), Complaint.created_at.isnot(None))
+    counted = 0
+    for complaint in complaints.yield_per(1000):
+        stats, bucket = _contribution(complaint)
+        stats_rows.append(stats)
+        if bucket:
+            bucket_rows.append(bucket)
+        counted += 1
+    for model, rows, counters in ((WardDailyStats, stats_rows, STATS_COUNTERS), (WardResolutionBucket, bucket_rows, BUCKET_COUNTERS)):
+        values = _merge(model, rows, counters)
+        # batches stay under the bound parameter limit of older sqlite builds
+        for start in range(0, len(values), REBUILD_BATCH_ROWS):
+            db.execute(_increment(db, model, values[start:start + REBUILD_BATCH_ROWS], counters))
+    db.commit()
+    return counted
+
+
+def median_resolution_hours(buckets: dict):
+    # median of a {bucket: count} histogram, interpolated linearly inside its bucket
+    total = sum(buckets.values())
+    if total <= 0:
+        return None
+    target = total / 2
+    seen = 0
+    for bucket in sorted(buckets):
+        count = buckets[bucket]
+        if count > 0 and seen + count >= target:
+            lower = RESOLUTION_BUCKET_HOURS[bucket - 1] if bucket else 0
+            if bucket >= len(RESOLUTION_BUCKET_HOURS):
+                return float(lower)
+            return lower + (RESOLUTION_BUCKET_HOURS[bucket] - lower) * (target - seen) / count
+        seen += count
+    return None
+
+
+def _summary(created: int, completed: int, votes: int, resolution_seconds: int, buckets: dict) -> dict:
+    timed = sum(buckets.values())
+    return {
+        "created": created,
+        "completed": completed,
+        "pending": created - completed,
+        "votes": votes,
+        "median_resolution_hours": median_resolution_hours(buckets),
+        "mean_resolution_hours": resolution_seconds / timed / 3600 if timed else None,
+    }
+
+
+def ward_dashboard(db: Session, ward_id: int, since: datetime.date, until: datetime.date, top_pending: int = 10):
+    in_range = (WardDailyStats.ward_id == ward_id, WardDailyStats.day >= since, WardDailyStats.day <= until)
+    by_type = db.query(
+        WardDailyStats.complaint_type, ComplaintType.type_name,
+        *(func.sum(getattr(WardDailyStats, counter)) for counter in STATS_COUNTERS),
+    ).join(ComplaintType, ComplaintType.id == WardDailyStats.complaint_type).filter(*in_range).group_by(
+        WardDailyStats.complaint_type, ComplaintType.type_name
+    ).order_by(WardDailyStats.complaint_type).all()
+    daily = db.query(
+        WardDailyStats.day, func.sum(WardDailyStats.created_count), func.sum(WardDailyStats.completed_count),
+    ).filter(*in_range).group_by(WardDailyStats.day).order_by(WardDailyStats.day).all()
+    buckets = db.query(
+        WardResolutionBucket.complaint_type, WardResolutionBucket.bucket, func.sum(WardResolutionBucket.complaint_count),
+    ).filter(
+        WardResolutionBucket.ward_id == ward_id, WardResolutionBucket.day >= since, WardResolutionBucket.day <= until,
+    ).group_by(WardResolutionBucket.complaint_type, WardResolutionBucket.bucket).all()
+
+    type_buckets = defaultdict(lambda: defaultdict(int))
+    all_buckets = defaultdict(int)
+    for complaint_type, bucket, count in buckets:
+        type_buckets[complaint_type][bucket] += count
+        all_buckets[bucket] += count
+    types = []
+    totals = dict.fromkeys(STATS_COUNTERS, 0)
+    for complaint_type, type_name, *counters in by_type:
+        counters = [value or 0 for value in counters]
+        for counter, value in zip(STATS_COUNTERS, counters):
+            totals[counter] += value
+        types.append(dict(_summary(*counters, type_buckets[complaint_type]), complaint_type=complaint_type, type_name=type_name))
+
+    # the one figure not in the rollups, a seek on the popular feed index rather than a scan
+    top = db.query(Complaint.id, Complaint.complaint_title, Complaint.complaint_type, Complaint.like_count, Complaint.created_at).filter(
+        Complaint.ward_id == ward_id, Complaint.completed_status == "PENDING",
+    ).order_by(Complaint.like_count.desc(), Complaint.id.desc()).limit(top_pending).all()
+    return {
+        "ward_id": ward_id,
+        "since": since,
+        "until": until,
+        "totals": _summary(*(totals[counter] for counter in STATS_COUNTERS), all_buckets),
+        "by_type": types,
+        "daily": [{"day": day, "created": created or 0, "completed": completed or 0} for day, created, completed in daily],
+        "top_pending": [row._asdict() for row in top],
+    }
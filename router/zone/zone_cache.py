@@ -0,0 +1,150 @@
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+
+from fastapi import Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from database.config import db_settings
+from database.crud import upsert_insert
+from database.db import SessionLocal
+from database.models import (CacheGeneration, ComplaintSubType, ComplaintType,
+                             District, Municipality, Ward)
+
+STATIC_MODELS = (District, Municipality, Ward, ComplaintType, ComplaintSubType)
+CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=86400"
+GENERATION_NAME = "zone"
+
+
+class CachedPayload:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        self.etag = '"{}"'.format(hashlib.sha1(self.body).hexdigest())
+
+
+def _row(obj) -> dict:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _group(rows, key: str) -> dict:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[key]].append(row)
+    return grouped
+
+
+class ZoneCache:
+    # read-through cache for the geography and complaint taxonomy tables, served as
+    # pre-encoded json bodies keyed by endpoint. every ZONE_CACHE_CHECK_SECONDS one primary
+    # key read compares the shared generation, so a change committed by another worker or
+    # announced by `python manage.py invalidate-zone-cache` is picked up; unannounced edits
+    # are picked up once the copy is ZONE_CACHE_TTL_SECONDS old
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._entries = None
+        self._generation = None
+        self._expires_at = 0.0
+        self._check_at = 0.0
+
+    def _load(self, db: Session) -> dict:
+        districts = [_row(d) for d in db.query(District).order_by(District.district_id)]
+        municipalities = [_row(m) for m in db.query(Municipality).order_by(Municipality.municipality_id)]
+        wards = [_row(w) for w in db.query(Ward).order_by(Ward.ward_id)]
+        complaint_types = [_row(t) for t in db.query(ComplaintType).order_by(ComplaintType.id)]
+        sub_types = [_row(s) for s in db.query(ComplaintSubType).order_by(ComplaintSubType.id)]
+        entries = {
+            ("districts",): CachedPayload(districts),
+            ("districts_and_complaint_types",): CachedPayload(
+                {"districts": districts, "complaints_types": complaint_types}
+            ),
+        }
+        for district_id, rows in _group(municipalities, "district_id").items():
+            entries[("municipalities", district_id)] = CachedPayload(rows)
+        for municipality_id, rows in _group(wards, "municipality_id").items():
+            entries[("wards", municipality_id)] = CachedPayload(rows)
+        for parent_type, rows in _group(sub_types, "parent_type").items():
+            entries[("complaint_subtypes", parent_type)] = CachedPayload(rows)
+        return entries
+
+    def _refresh(self, now: float):
+        db: Session = self._session_factory()
+        try:
+            generation = db.execute(
+                select(CacheGeneration.generation).where(CacheGeneration.name == GENERATION_NAME)
+            ).scalar()
+            if self._entries is None or generation != self._generation or now >= self._expires_at:
+                self._entries = self._load(db)
+                self._generation = generation
+                self._expires_at = now + db_settings.ZONE_CACHE_TTL_SECONDS
+        finally:
+            db.close()
+        self._check_at = now + db_settings.ZONE_CACHE_CHECK_SECONDS
+
+    def get(self, *key) -> CachedPayload:
+        entries = self._entries
+        if entries is None or time.monotonic() >= self._check_at:
+            with self._lock:
+                now = time.monotonic()
+                if self._entries is None or now >= self._check_at:
+                    self._refresh(now)
+                entries = self._entries
+        # unknown ids serve an empty list, same as the filtered query did
+        return entries.get(key) or _EMPTY
+
+    def respond(self, request: Request, *key) -> Response:
+        payload = self.get(*key)
+        headers = {"ETag": payload.etag, "Cache-Control": CACHE_CONTROL}
+        if_none_match = request.headers.get("if-none-match", "")
+        if payload.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        return Response(content=payload.body, media_type="application/json", headers=headers)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+
+
+_EMPTY = CachedPayload([])
+
+zone_cache = ZoneCache()
+
+
+def invalidate_zone_cache():
+    zone_cache.invalidate()
+
+
+def bump_zone_generation(db: Session):
+    # the migration creates the row; databases built with create_all get it on the first bump
+    statement = upsert_insert(db, CacheGeneration).values(name=GENERATION_NAME, generation=1)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["name"], set_={"generation": CacheGeneration.generation + 1},
+    ))
+
+
+# a flush touching one of the cached tables bumps the generation in the same transaction,
+# and its commit drops this process's copy straight away
+@event.listens_for(Session, "after_flush")
+def _mark_static_tables_changed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, STATIC_MODELS):
+            if not session.info.get("zone_cache_stale"):
+                bump_zone_generation(session)
+            session.info["zone_cache_stale"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("zone_cache_stale", False):
+        invalidate_zone_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_after_rollback(session):
+    session.info.pop("zone_cache_stale", None)